@@ -0,0 +1,314 @@
+import json
+import zlib
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import delete, exists, func, or_, select
+
+from models import db, TimetableSession, StudySession, TimetableArchive, StudySessionArchive
+from sqlite_profile import retry_on_locked
+
+# Sessions dated before a cutoff move out of timetable_session and
+# study_session, which every timetable and active-session query hits, into
+# one archive row per user and month (and subject, for study sessions)
+# holding the rows as zlib-compressed JSON, with the totals the progress
+# page needs in plain columns. The read functions below merge both sides.
+
+# Timetable sessions moved per transaction, with their study sessions
+ARCHIVE_BATCH_SIZE = 500
+# The progress page reads the last week straight from the hot tables
+MIN_ARCHIVE_DAYS = 14
+
+TimetableRow = namedtuple(
+    'TimetableRow', 'id subject_id date start_time end_time duration is_completed archived'
+)
+StudyRow = namedtuple(
+    'StudyRow', 'id subject_id timetable_session_id start_time end_time duration_minutes units_completed archived'
+)
+
+
+def _pack(rows):
+    return zlib.compress(json.dumps(rows, separators=(',', ':')).encode(), 6)
+
+
+def _unpack(payload):
+    return json.loads(zlib.decompress(payload))
+
+
+def _month(day):
+    return day.replace(day=1)
+
+
+def _day_start(day):
+    return datetime.combine(day, time.min)
+
+
+# ---------------------- Moving rows ---------------------- #
+def _archivable(cutoff):
+    """
+    Timetable sessions dated before cutoff whose study sessions, if any,
+    all ended before it too. A slot with an open study session stays hot.
+    """
+    return (
+        TimetableSession.date < cutoff,
+        ~exists().where(
+            StudySession.timetable_session_id == TimetableSession.id,
+            or_(StudySession.is_completed.is_(False), StudySession.end_time >= _day_start(cutoff)),
+        ),
+    )
+
+
+def pending(cutoff):
+    """(timetable sessions, study sessions, users) that archiving at cutoff would move."""
+    slots = select(TimetableSession.id, TimetableSession.user_id).where(*_archivable(cutoff)).subquery()
+    count, users = db.session.execute(
+        select(func.count(slots.c.id), func.count(slots.c.user_id.distinct()))
+    ).one()
+    sessions = db.session.scalar(
+        select(func.count(StudySession.id)).where(StudySession.timetable_session_id.in_(select(slots.c.id)))
+    )
+    db.session.commit()
+    return count, sessions, users
+
+
+def _archived(model, groups, key_columns):
+    """The existing archive rows for these group keys, by key, read in one query."""
+    rows = model.query.filter(
+        model.user_id.in_(sorted({key[0] for key in groups})),
+        model.month.in_(sorted({key[-1] for key in groups})),
+    ).all()
+    return {tuple(getattr(row, column) for column in key_columns): row for row in rows}
+
+
+def _merge(archived, model, key, rows, totals, sort_key):
+    """Append rows to an archive row (None: create it). Runs no queries."""
+    if archived is None:
+        archived = model(payload=b'', **key, **{name: 0 for name in totals})
+        db.session.add(archived)
+        merged = rows
+    else:
+        merged = _unpack(archived.payload) + rows
+    merged.sort(key=sort_key)
+    archived.payload = _pack(merged)
+    for name, value in totals.items():
+        setattr(archived, name, getattr(archived, name) + value)
+
+
+@retry_on_locked
+def _archive_batch(cutoff, batch_size):
+    # Only archiving writes; the read functions below are imported by pages
+    from persistence import _chunks, delete_sessions
+
+    slots = db.session.execute(
+        select(
+            TimetableSession.id, TimetableSession.user_id, TimetableSession.subject_id, TimetableSession.date,
+            TimetableSession.start_time, TimetableSession.end_time, TimetableSession.duration,
+            TimetableSession.is_completed,
+        ).where(*_archivable(cutoff))
+        .order_by(TimetableSession.user_id, TimetableSession.date, TimetableSession.id)
+        .limit(batch_size)
+    ).all()
+    if not slots:
+        db.session.commit()
+        return 0, 0
+
+    slot_ids = [slot.id for slot in slots]
+    studied = []
+    for chunk in _chunks(slot_ids):
+        studied.extend(db.session.execute(
+            select(
+                StudySession.id, StudySession.user_id, StudySession.subject_id,
+                StudySession.timetable_session_id, StudySession.start_time, StudySession.end_time,
+                StudySession.duration_minutes, StudySession.units_completed,
+            ).where(StudySession.timetable_session_id.in_(chunk))
+        ).all())
+
+    # Everything is read before the first write, so the write lock is only
+    # held for the flush and the deletes at the end
+    timetable_months = defaultdict(list)
+    for slot in slots:
+        timetable_months[slot.user_id, _month(slot.date)].append(slot)
+    study_months = defaultdict(list)
+    for session in studied:
+        study_months[session.user_id, session.subject_id, _month(session.end_time.date())].append(session)
+    timetable_archived = _archived(TimetableArchive, timetable_months, ('user_id', 'month'))
+    study_archived = _archived(StudySessionArchive, study_months, ('user_id', 'subject_id', 'month'))
+
+    for (user_id, month), group in timetable_months.items():
+        _merge(
+            timetable_archived.get((user_id, month)), TimetableArchive, {'user_id': user_id, 'month': month},
+            [[s.id, s.subject_id, s.date.isoformat(), s.start_time.isoformat(), s.end_time.isoformat(),
+              s.duration, bool(s.is_completed)] for s in group],
+            {'sessions': len(group), 'completed': sum(1 for s in group if s.is_completed)},
+            sort_key=lambda row: (row[2], row[3], row[0]),
+        )
+
+    for (user_id, subject_id, month), group in study_months.items():
+        _merge(
+            study_archived.get((user_id, subject_id, month)), StudySessionArchive,
+            {'user_id': user_id, 'subject_id': subject_id, 'month': month},
+            [[s.id, s.timetable_session_id, s.start_time.isoformat(), s.end_time.isoformat(),
+              s.duration_minutes or 0, s.units_completed or 0] for s in group],
+            {'sessions': len(group), 'minutes': sum(s.duration_minutes or 0 for s in group),
+             'units': sum(s.units_completed or 0 for s in group)},
+            sort_key=lambda row: (row[3], row[0]),
+        )
+
+    for chunk in _chunks([session.id for session in studied]):
+        db.session.execute(
+            delete(StudySession).where(StudySession.id.in_(chunk)).execution_options(synchronize_session=False)
+        )
+    delete_sessions(slot_ids)
+    db.session.commit()
+    return len(slots), len(studied)
+
+
+def archive_before(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move every archivable session dated before cutoff, batch_size timetable
+    sessions (plus their study sessions) per transaction. Yields the
+    running (timetable sessions, study sessions) moved after each batch, so
+    the caller can report progress or pause between batches.
+    """
+    moved_slots = moved_sessions = 0
+    while True:
+        slots, sessions = _archive_batch(cutoff, batch_size)
+        if not slots:
+            return
+        moved_slots += slots
+        moved_sessions += sessions
+        yield moved_slots, moved_sessions
+
+
+# ---------------------- Reading ---------------------- #
+def live_from(today):
+    """First day whose sessions are certainly still live: nothing newer than MIN_ARCHIVE_DAYS is archived."""
+    return today - timedelta(days=MIN_ARCHIVE_DAYS)
+
+
+def timetable_history(user_id, first_day=None, last_day=None):
+    """
+    The user's timetable sessions between two days (inclusive; either may
+    be None), live and archived, as TimetableRows in (date, start_time)
+    order.
+    """
+    query = select(
+        TimetableSession.id, TimetableSession.subject_id, TimetableSession.date, TimetableSession.start_time,
+        TimetableSession.end_time, TimetableSession.duration, TimetableSession.is_completed,
+    ).where(TimetableSession.user_id == user_id)
+    months = select(TimetableArchive.payload).where(TimetableArchive.user_id == user_id)
+    if first_day is not None:
+        query = query.where(TimetableSession.date >= first_day)
+        months = months.where(TimetableArchive.month >= _month(first_day))
+    if last_day is not None:
+        query = query.where(TimetableSession.date <= last_day)
+        months = months.where(TimetableArchive.month <= last_day)
+
+    rows = [TimetableRow(*row, archived=False) for row in db.session.execute(query)]
+    for payload in db.session.scalars(months):
+        for id, subject_id, day, start_time, end_time, duration, is_completed in _unpack(payload):
+            day = date.fromisoformat(day)
+            if (first_day is None or day >= first_day) and (last_day is None or day <= last_day):
+                rows.append(TimetableRow(
+                    id, subject_id, day, time.fromisoformat(start_time), time.fromisoformat(end_time),
+                    duration, is_completed, archived=True,
+                ))
+    rows.sort(key=lambda row: (row.date, row.start_time, row.id))
+    return rows
+
+
+def _after(row, cursor):
+    """Whether a row comes strictly after a (date, start_time, id or None) keyset cursor."""
+    if cursor is None:
+        return True
+    day, moment, row_id = cursor
+    if (row.date, row.start_time) != (day, moment):
+        return (row.date, row.start_time) > (day, moment)
+    return row_id is not None and row.id > row_id
+
+
+def archived_timetable_page(user_id, after, limit, subject_ids=None):
+    """
+    The user's first `limit` archived timetable sessions after the keyset
+    cursor `after` ((date, start_time, id or None); None: from the first),
+    as TimetableRows in (date, start_time, id) order, optionally only those
+    of `subject_ids`. Months are read in
+    order from the cursor's month on and reading stops once a month fills
+    the page, so a page costs about one month's payload.
+    """
+    months = select(TimetableArchive.payload).where(
+        TimetableArchive.user_id == user_id
+    ).order_by(TimetableArchive.month).execution_options(yield_per=1)
+    if after is not None:
+        months = months.where(TimetableArchive.month >= _month(after[0]))
+
+    rows = []
+    for payload in db.session.scalars(months):
+        for id, subject_id, day, start_time, end_time, duration, is_completed in _unpack(payload):
+            row = TimetableRow(
+                id, subject_id, date.fromisoformat(day), time.fromisoformat(start_time),
+                time.fromisoformat(end_time), duration, is_completed, archived=True,
+            )
+            if _after(row, after) and (subject_ids is None or subject_id in subject_ids):
+                rows.append(row)
+        if len(rows) >= limit:
+            break
+    rows.sort(key=lambda row: (row.date, row.start_time, row.id))
+    return rows[:limit]
+
+
+def study_history(user_id, first_day=None, last_day=None):
+    """
+    The user's completed study sessions that ended between two days
+    (inclusive; either may be None), live and archived, as StudyRows in
+    end_time order.
+    """
+    query = select(
+        StudySession.id, StudySession.subject_id, StudySession.timetable_session_id, StudySession.start_time,
+        StudySession.end_time, StudySession.duration_minutes, StudySession.units_completed,
+    ).where(StudySession.user_id == user_id, StudySession.is_completed.is_(True))
+    months = select(StudySessionArchive.subject_id, StudySessionArchive.payload).where(
+        StudySessionArchive.user_id == user_id
+    )
+    if first_day is not None:
+        query = query.where(StudySession.end_time >= _day_start(first_day))
+        months = months.where(StudySessionArchive.month >= _month(first_day))
+    if last_day is not None:
+        query = query.where(StudySession.end_time < _day_start(last_day + timedelta(days=1)))
+        months = months.where(StudySessionArchive.month <= last_day)
+
+    rows = [StudyRow(*row, archived=False) for row in db.session.execute(query)]
+    for subject_id, payload in db.session.execute(months):
+        for id, timetable_session_id, start_time, end_time, minutes, units in _unpack(payload):
+            end_time = datetime.fromisoformat(end_time)
+            day = end_time.date()
+            if (first_day is None or day >= first_day) and (last_day is None or day <= last_day):
+                rows.append(StudyRow(
+                    id, subject_id, timetable_session_id, datetime.fromisoformat(start_time), end_time,
+                    minutes, units, archived=True,
+                ))
+    rows.sort(key=lambda row: (row.end_time, row.id))
+    return rows
+
+
+def daily_study_totals(first_user, last_user):
+    """
+    Archived study per (user_id, day, subject_id) for a range of user ids,
+    as rollup rows (see rollup.backfill).
+    """
+    totals = defaultdict(lambda: [0, 0, 0])
+    archived = db.session.execute(
+        select(StudySessionArchive.user_id, StudySessionArchive.subject_id, StudySessionArchive.payload)
+        .where(StudySessionArchive.user_id.between(first_user, last_user))
+    )
+    for user_id, subject_id, payload in archived:
+        for _, _, _, end_time, minutes, units in _unpack(payload):
+            row = totals[user_id, datetime.fromisoformat(end_time).date(), subject_id]
+            row[0] += minutes
+            row[1] += units
+            row[2] += 1
+    return [
+        {'user_id': user_id, 'day': day, 'subject_id': subject_id,
+         'minutes': minutes, 'units': units, 'sessions': sessions}
+        for (user_id, day, subject_id), (minutes, units, sessions) in totals.items()
+    ]
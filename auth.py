@@ -0,0 +1,128 @@
+from flask import Blueprint, render_template, redirect, url_for, request, flash
+from flask_login import login_user, logout_user, login_required, current_user
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from cache import CachedLoader, TTLCache
+from extensions import login_manager
+from hashing import HashingBusy, hasher, ip_attempts, username_attempts
+from models import db, User, UserRecord
+from sqlite_profile import retry_on_locked
+
+bp = Blueprint('auth', __name__)
+
+
+def _load_user_record(user_id):
+    user = db.session.get(User, user_id)
+    return UserRecord.from_user(user) if user else None
+
+# Identity lookups for authenticated requests skip the database while cached
+user_cache = CachedLoader(_load_user_record, TTLCache(maxsize=4096, ttl=300))
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user_record(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
+@login_manager.user_loader
+def load_user(user_id):
+    return user_cache.get(int(user_id))
+
+def _throttled(template, *keys):
+    """
+    Count the attempt against each (limiter, key); when one is over its
+    limit, answer 429 with the form and a Retry-After header.
+    """
+    wait = max(limiter.hit(key) for limiter, key in keys)
+    if not wait:
+        return None
+    flash(f'Too many attempts. Please try again in {wait} seconds.', 'danger')
+    return render_template(template), 429, {'Retry-After': str(wait)}
+
+def _busy(template):
+    flash('The server is busy. Please try again in a moment.', 'warning')
+    return render_template(template), 503, {'Retry-After': '1'}
+
+@retry_on_locked
+def _create_user(username, email, password_hash):
+    user = User(username=username, email=email, password=password_hash)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'POST':
+        username = request.form.get('username')
+        email = request.form.get('email')
+        password = request.form.get('password')
+
+        throttled = _throttled('register.html', (ip_attempts, request.remote_addr))
+        if throttled:
+            return throttled
+
+        existing_user = User.query.filter((User.username == username) | (User.email == email)).first()
+        if existing_user:
+            flash('Username or email already exists', 'danger')
+            return redirect(url_for('auth.register'))
+
+        # Give the connection back to the pool while the hash is computed
+        db.session.rollback()
+        try:
+            password_hash = hasher.hash(password)
+        except HashingBusy:
+            return _busy('register.html')
+
+        # Only the insert is retried on a lock error; the throttle and the
+        # hash above are not paid again
+        try:
+            _create_user(username, email, password_hash)
+            flash('Registration successful! Please login.', 'success')
+            return redirect(url_for('auth.login'))
+        except OperationalError:
+            raise
+        except Exception:
+            db.session.rollback()
+            flash('Registration failed. Please try again.', 'danger')
+
+    return render_template('register.html')
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+
+        throttled = _throttled('login.html', (ip_attempts, request.remote_addr),
+                               (username_attempts, (username or '').lower()))
+        if throttled:
+            return throttled
+
+        user = User.query.filter_by(username=username).first()
+        stored_hash = user.password if user else None
+        # Give the connection back to the pool while the hash is checked
+        db.session.rollback()
+        try:
+            matches, new_hash = hasher.verify(stored_hash, password) if user else (False, None)
+        except HashingBusy:
+            return _busy('login.html')
+
+        if matches:
+            if new_hash:
+                # Hashed with older parameters; store the upgraded hash
+                user.password = new_hash
+                try:
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+            login_user(user)
+            return redirect(url_for('pages.dashboard'))
+        flash('Invalid username or password', 'danger')
+    return render_template('login.html')
+
+@bp.route('/logout')
+@login_required
+def logout():
+    user_cache.invalidate(current_user.id)
+    logout_user()
+    return redirect(url_for('pages.home'))
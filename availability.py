@@ -0,0 +1,85 @@
+from datetime import datetime
+
+from flask import Blueprint, render_template, redirect, url_for, request, flash
+from flask_login import login_required, current_user
+
+import queries
+from intervals import to_minutes
+from jobs import runner
+from models import db, CalendarBlock
+from sqlite_profile import retry_on_locked
+
+bp = Blueprint('availability', __name__)
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+
+def _block_from_form(form):
+    """A CalendarBlock from the submitted form, or raises ValueError with a message to show."""
+    kind = form.get('kind')
+    if kind not in ('available', 'busy'):
+        raise ValueError('Choose whether you are available or busy.')
+    try:
+        start_time = datetime.strptime(form.get('start_time', ''), '%H:%M').time()
+        end_time = datetime.strptime(form.get('end_time', ''), '%H:%M').time()
+    except ValueError:
+        raise ValueError('Enter start and end times as HH:MM.')
+    if to_minutes(end_time) <= to_minutes(start_time):
+        raise ValueError('The end time must be after the start time.')
+
+    block = CalendarBlock(user_id=current_user.id, kind=kind, start_time=start_time, end_time=end_time)
+    if form.get('date'):
+        try:
+            block.date = datetime.strptime(form['date'], '%Y-%m-%d').date()
+        except ValueError:
+            raise ValueError('Enter the date as YYYY-MM-DD.')
+    elif form.get('weekday', '').isdigit() and int(form['weekday']) < 7:
+        block.weekday = int(form['weekday'])
+    else:
+        raise ValueError('Choose a weekday or a date.')
+    return block
+
+
+@retry_on_locked
+def _add_block(block):
+    db.session.add(block)
+    db.session.commit()
+
+
+@retry_on_locked
+def _delete_block(block):
+    db.session.delete(block)
+    db.session.commit()
+
+
+@bp.route('/availability', methods=['GET', 'POST'])
+@login_required
+def availability():
+    if request.method == 'POST':
+        try:
+            block = _block_from_form(request.form)
+        except ValueError as exc:
+            flash(str(exc), 'danger')
+            return redirect(url_for('availability.availability'))
+        # Only the insert is retried on a lock error, not the re-plan below
+        _add_block(block)
+        # Future days are re-planned around the new block
+        runner.submit_reschedule(current_user.id)
+        flash('Availability updated. Your timetable from tomorrow on is being re-planned.', 'success')
+        return redirect(url_for('availability.availability'))
+
+    return render_template('availability.html', blocks=queries.calendar_blocks(current_user.id),
+                           weekdays=WEEKDAYS)
+
+@bp.route('/availability/<int:block_id>/delete', methods=['POST'])
+@login_required
+def delete_block(block_id):
+    block = CalendarBlock.query.get_or_404(block_id)
+    if block.user_id != current_user.id:
+        flash("Unauthorized action.", "danger")
+        return redirect(url_for('availability.availability'))
+    # Only the delete is retried on a lock error, not the re-plan below
+    _delete_block(block)
+    runner.submit_reschedule(current_user.id)
+    flash("Block removed.", "success")
+    return redirect(url_for('availability.availability'))
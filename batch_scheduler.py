@@ -0,0 +1,128 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from scheduler import FATIGUE_PENALTY, build_sessions, _max_useful_sessions
+
+# Problems solved together in one set of arrays; bounds the choice matrix to
+# roughly sessions * counts * BLOCK_SIZE * minutes bytes
+BLOCK_SIZE = 512
+# Users handed to a worker process at a time
+SHARD_SIZE = 2000
+
+
+def _solve_block(problems, time_limit):
+    """
+    Solve a block of independent knapsacks with NumPy, one row per problem.
+
+    Same DP as scheduler.generate_knapsack_schedule (state = sessions taken,
+    minutes used; strict improvement to take; first best count wins), but
+    every step runs over the whole (problem, minute) plane at once. Problems
+    with fewer sessions are padded with sessions that never fit.
+    """
+    sessions = [build_sessions(subjects) for subjects in problems]
+    size = len(problems)
+    n = max((len(items) for items in sessions), default=0)
+    if n == 0 or time_limit <= 0:
+        return [[] for _ in problems]
+
+    width = time_limit + 1
+    durations = np.full((size, n), width, dtype=np.int64)
+    values = np.zeros((size, n))
+    max_counts = np.zeros(size, dtype=np.int64)
+    for b, items in enumerate(sessions):
+        for i, item in enumerate(items):
+            durations[b, i] = item['duration']
+            values[b, i] = item['priority']
+        if items:
+            max_counts[b] = _max_useful_sessions(items, time_limit, FATIGUE_PENALTY)
+
+    max_count = int(max_counts.max())
+    if max_count == 0:
+        return [[] for _ in problems]
+
+    minutes = np.arange(width)
+    rows = np.arange(size)[:, None]
+    # dp[k, b, t]: best value of problem b with exactly k sessions in at most t minutes
+    dp = np.full((max_count + 1, size, width), -np.inf)
+    dp[0] = 0.0
+    # choices[i, k, b, t]: session i was taken as number k
+    choices = np.zeros((n, max_count, size, width), dtype=bool)
+
+    for i in range(n):
+        duration = durations[:, i][:, None]
+        source = minutes - duration  # minute index before taking session i
+        fits = source >= 0
+        source = np.maximum(source, 0)
+
+        for k in range(min(i, max_count - 1), -1, -1):
+            gain = values[:, i] * (1 - FATIGUE_PENALTY * k)
+            take = np.where(fits, dp[k][rows, source] + gain[:, None], -np.inf)
+            # Rows past a problem's own session cap stay as they are
+            taken = (take > dp[k + 1]) & (k < max_counts)[:, None]
+            if not taken.any():
+                continue
+            np.copyto(dp[k + 1], take, where=taken)
+            choices[i, k] = taken
+
+    best = np.argmax(dp[:, :, time_limit], axis=0)
+
+    # Backtrack every problem at once, collecting (problem, session) picks
+    t = np.full(size, time_limit)
+    k = best.copy()
+    picks = [[] for _ in problems]
+    for i in range(n - 1, -1, -1):
+        active = k > 0
+        if not active.any():
+            break
+        taken = np.zeros(size, dtype=bool)
+        taken[active] = choices[i, k[active] - 1, np.flatnonzero(active), t[active]]
+        for b in np.flatnonzero(taken):
+            picks[b].append(sessions[b][i])
+        t = np.where(taken, t - durations[:, i], t)
+        k = np.where(taken, k - 1, k)
+
+    # Last-taken session first, like generate_knapsack_schedule
+    return picks
+
+
+def solve_batch(problems, time_limit, block_size=BLOCK_SIZE):
+    """
+    Daily knapsack schedules for many subject lists at once.
+
+    Returns one schedule per problem, identical to calling
+    generate_knapsack_schedule on each of them.
+    """
+    schedules = []
+    for start in range(0, len(problems), block_size):
+        schedules.extend(_solve_block(problems[start:start + block_size], time_limit))
+    return schedules
+
+
+def _solve_shard(shard, time_limit):
+    user_ids = [user_id for user_id, _ in shard]
+    schedules = solve_batch([subjects for _, subjects in shard], time_limit)
+    return list(zip(user_ids, schedules))
+
+
+def plan_all(subjects_by_user, time_limit, processes=None, shard_size=SHARD_SIZE):
+    """
+    Solve the day's schedule of every user in `subjects_by_user`
+    ({user_id: [SubjectSpec, ...]}) and return {user_id: schedule}.
+
+    Users are split into shards solved in parallel by a process pool;
+    processes=0 solves everything in the calling process.
+    """
+    items = list(subjects_by_user.items())
+    shards = [items[i:i + shard_size] for i in range(0, len(items), shard_size)]
+
+    if processes == 0 or len(shards) <= 1:
+        return dict(pair for shard in shards for pair in _solve_shard(shard, time_limit))
+
+    plans = {}
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(processes, mp_context=context) as pool:
+        for result in pool.map(_solve_shard, shards, [time_limit] * len(shards)):
+            plans.update(result)
+    return plans
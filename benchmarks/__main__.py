@@ -0,0 +1,150 @@
+"""
+Run the benchmark suite.
+
+    python -m benchmarks                     # run every case, compare with the baseline
+    python -m benchmarks -k knapsack         # only cases whose name contains 'knapsack'
+    python -m benchmarks --save              # record the results as the new baseline
+    python -m benchmarks --profile --memory  # also dump cProfile stats and peak memory
+
+Exits with status 1 when a case's fastest run is slower than the baseline's
+by more than --threshold, or when its output fingerprint differs from the baseline's.
+"""
+import argparse
+import cProfile
+import hashlib
+import json
+import os
+import pstats
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks.cases import CASES, Env
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def fingerprint(bench, result):
+    if bench.fingerprint is None:
+        return None
+    data = json.dumps(bench.fingerprint(result), sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+
+def measure(bench, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        if bench.before:
+            bench.before()
+        started = time.perf_counter()
+        result = bench.run()
+        samples.append(time.perf_counter() - started)
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'repeat': repeat,
+        'fingerprint': fingerprint(bench, result),
+    }
+
+
+def profile(name, bench, output_dir):
+    if bench.before:
+        bench.before()
+    profiler = cProfile.Profile()
+    profiler.runcall(bench.run)
+    path = os.path.join(output_dir, f'{name}.prof')
+    profiler.dump_stats(path)
+    print(f'    profile written to {path}; top functions by cumulative time:')
+    pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(8)
+
+
+def peak_memory(bench):
+    if bench.before:
+        bench.before()
+    tracemalloc.start()
+    try:
+        bench.run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def compare(name, result, baseline, threshold):
+    """Problems with `result` relative to the baseline entry, if any."""
+    base = baseline.get(name)
+    if base is None:
+        return []
+    problems = []
+    # The fastest run is the least noisy estimate of the code's own cost
+    if result['min'] > base['min'] * (1 + threshold):
+        problems.append(f"{result['min'] / base['min']:.2f}x slower than baseline "
+                        f"({base['min'] * 1000:.2f} ms)")
+    if base.get('fingerprint') and result['fingerprint'] and base['fingerprint'] != result['fingerprint']:
+        problems.append('output differs from baseline')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Run the benchmark suite.')
+    parser.add_argument('-k', dest='pattern', default='', help='Only run cases whose name contains this.')
+    parser.add_argument('--list', action='store_true', help='List the cases and exit.')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case.')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON file.')
+    parser.add_argument('--save', action='store_true', help='Write the results to the baseline file.')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed slowdown of the fastest run over the baseline, as a fraction.')
+    parser.add_argument('--profile', action='store_true', help='Dump cProfile stats for each case.')
+    parser.add_argument('--memory', action='store_true', help='Report peak traced memory per case.')
+    parser.add_argument('--output', default='.', help='Directory for .prof files.')
+    args = parser.parse_args()
+
+    names = [name for name in CASES if args.pattern in name]
+    if args.list:
+        print('\n'.join(names))
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    env = Env()
+    results = {}
+    failures = 0
+    try:
+        for name in names:
+            bench = CASES[name](env)
+            result = measure(bench, args.repeat)
+            if args.memory:
+                result['peak_memory'] = peak_memory(bench)
+            results[name] = result
+
+            line = f"{name:<24} {result['median'] * 1000:10.2f} ms  (min {result['min'] * 1000:.2f} ms)"
+            if args.memory:
+                line += f"  peak {result['peak_memory'] / 1024 / 1024:.1f} MiB"
+            problems = [] if args.save else compare(name, result, baseline, args.threshold)
+            if problems:
+                failures += 1
+                line += '  FAIL: ' + '; '.join(problems)
+            print(line)
+
+            if args.profile:
+                profile(name, bench, args.output)
+    finally:
+        env.close()
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f'Baseline written to {args.baseline}')
+    elif failures:
+        print(f'{failures} case(s) regressed')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""
+Archiving under load.
+
+    python -m benchmarks.archive_history --users 100 --days 365
+
+Seeds a year of timetable and study sessions for many users, then runs
+`flask archive`'s batches while a writer thread keeps committing short
+transactions, as completing sessions would. Reports archive throughput,
+the writer's latency with and without archiving running, and the archive's
+size per session, and checks that every user's progress figures and
+history are unchanged. Exits with status 1 on a failure.
+"""
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time as timer
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import func, insert, select, update
+
+
+def make_app(directory):
+    from app import create_app
+    from models import db
+
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{directory}/archive.db',
+        'JOB_PROCESSES': 0,
+    })
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed(app, users, days, per_day, seed):
+    """`per_day` sessions a day for `days` days per user, most of them studied."""
+    from models import db, User, Subject, TimetableSession, StudySession
+
+    rng = random.Random(seed)
+    today = date.today()
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {'id': uid, 'username': f'u{uid}', 'email': f'u{uid}@example.com', 'password': '-'}
+            for uid in range(1, users + 1)
+        ])
+        db.session.execute(insert(Subject), [
+            {'id': uid * 10 + k, 'user_id': uid, 'name': f'Subject {k}', 'days_left': 30, 'total_units': 1000,
+             'completed_units': 0, 'priority': 1 + k, 'complexity': 3}
+            for uid in range(1, users + 1) for k in range(3)
+        ])
+        slot_id = 0
+        for uid in range(1, users + 1):
+            slots, sessions = [], []
+            for offset in range(days, 0, -1):
+                day = today - timedelta(days=offset)
+                for i in range(per_day):
+                    slot_id += 1
+                    start = datetime.combine(day, time(9 + 2 * i, 0))
+                    duration = rng.choice((25, 30, 45, 60))
+                    done = rng.random() < 0.8
+                    subject_id = uid * 10 + rng.randrange(3)
+                    slots.append({
+                        'id': slot_id, 'user_id': uid, 'subject_id': subject_id, 'date': day,
+                        'start_time': start.time(), 'end_time': (start + timedelta(minutes=duration)).time(),
+                        'duration': duration, 'is_completed': done,
+                    })
+                    if done:
+                        sessions.append({
+                            'user_id': uid, 'subject_id': subject_id, 'timetable_session_id': slot_id,
+                            'start_time': start, 'end_time': start + timedelta(minutes=duration),
+                            'duration_minutes': duration, 'units_completed': rng.randint(0, 2),
+                            'is_completed': True,
+                        })
+            db.session.execute(insert(TimetableSession), slots)
+            db.session.execute(insert(StudySession), sessions)
+        db.session.commit()
+
+
+def snapshot(app, users):
+    import archive
+    import stats
+
+    with app.app_context():
+        result = {}
+        for uid in range(1, users + 1):
+            result[uid] = (
+                stats.overview(uid),
+                [(subject.id, sessions, minutes) for subject, sessions, minutes in stats.subject_stats(uid)],
+                [row[:-1] for row in archive.study_history(uid)],
+                [row[:-1] for row in archive.timetable_history(uid)],
+            )
+        return result
+
+
+class Writer(threading.Thread):
+    """Commits one short UPDATE after another and records how long each took."""
+
+    def __init__(self, app):
+        super().__init__(daemon=True)
+        self.app = app
+        self.latencies = []
+        self.errors = []
+        self.running = threading.Event()
+        self.stopped = threading.Event()
+
+    def run(self):
+        from models import db, Subject
+        from sqlite_profile import retry_on_locked
+
+        @retry_on_locked
+        def write():
+            db.session.execute(update(Subject).where(Subject.id == 10).values(days_left=Subject.days_left + 0))
+            db.session.commit()
+
+        with self.app.app_context():
+            while not self.stopped.is_set():
+                self.running.wait()
+                started = timer.perf_counter()
+                try:
+                    write()
+                except Exception as exc:
+                    self.errors.append(repr(exc))
+                    db.session.rollback()
+                self.latencies.append(timer.perf_counter() - started)
+                timer.sleep(0.002)
+
+    def measure(self, seconds=None, until=None):
+        self.latencies = []
+        self.running.set()
+        if until is not None:
+            until()
+        else:
+            timer.sleep(seconds)
+        self.running.clear()
+        timer.sleep(0.05)
+        return sorted(self.latencies)
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))] * 1000 if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive a year of sessions while writes continue.')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--per-day', type=int, default=3)
+    parser.add_argument('--older-than', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='studyplanner-archive-')
+    failures = []
+    try:
+        app = make_app(directory)
+        started = timer.perf_counter()
+        seed(app, args.users, args.days, args.per_day, args.seed)
+        print(f'seeded {args.users * args.days * args.per_day} timetable sessions '
+              f'in {timer.perf_counter() - started:.1f}s')
+        before = snapshot(app, args.users)
+
+        import archive
+        from models import TimetableSession, StudySession, TimetableArchive, StudySessionArchive
+        from models import db
+
+        writer = Writer(app)
+        writer.start()
+        idle = writer.measure(seconds=2)
+
+        cutoff = date.today() - timedelta(days=args.older_than)
+        with app.app_context():
+            slots, sessions, users = archive.pending(cutoff)
+        batches = []
+
+        def run_archive():
+            with app.app_context():
+                last = timer.perf_counter()
+                for _ in archive.archive_before(cutoff, args.batch_size):
+                    now = timer.perf_counter()
+                    batches.append(now - last)
+                    last = now
+
+        started = timer.perf_counter()
+        busy = writer.measure(until=run_archive)
+        elapsed = timer.perf_counter() - started
+        writer.stopped.set()
+        writer.running.set()
+        writer.join()
+
+        with app.app_context():
+            left = archive.pending(cutoff)[0]
+            hot = db.session.scalar(select(func.count(TimetableSession.id)))
+            hot_sessions = db.session.scalar(select(func.count(StudySession.id)))
+            payload = sum(db.session.scalar(select(func.coalesce(func.sum(func.length(model.payload)), 0)))
+                          for model in (TimetableArchive, StudySessionArchive))
+        after = snapshot(app, args.users)
+
+        print(f'archived {slots} timetable + {sessions} study sessions of {users} users '
+              f'in {elapsed:.2f}s ({(slots + sessions) / elapsed:,.0f} rows/s, {len(batches)} batches, '
+              f'slowest {max(batches, default=0) * 1000:.0f} ms)')
+        print(f'left hot: {hot} timetable, {hot_sessions} study sessions')
+        print(f'archive payload {payload / 1024:.0f} KiB, {payload / max(1, slots + sessions):.1f} bytes/session')
+        print(f'writer latency  idle: p50 {percentile(idle, 0.5):6.1f} ms  p99 {percentile(idle, 0.99):6.1f} ms  '
+              f'max {percentile(idle, 1):6.1f} ms')
+        print(f'           archiving: p50 {percentile(busy, 0.5):6.1f} ms  p99 {percentile(busy, 0.99):6.1f} ms  '
+              f'max {percentile(busy, 1):6.1f} ms  ({len(busy)} writes)')
+
+        if left:
+            failures.append(f'{left} timetable sessions left unarchived')
+        if writer.errors:
+            failures.append(f'{len(writer.errors)} writes failed, e.g. {writer.errors[0]}')
+        changed = [uid for uid in before if before[uid] != after[uid]]
+        if changed:
+            failures.append(f'progress or history changed for {len(changed)} users, e.g. user {changed[0]}')
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    for failure in failures:
+        print('FAIL:', failure)
+    print('FAILED' if failures else 'OK')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Authenticated routes with and without the identity cache.
+
+    python -m benchmarks.auth_routes --users 20 --seconds 3
+
+Logged-in clients of --users users take turns requesting each route, first
+with load_user going through auth.user_cache as it does in production, then
+with a cache that keeps nothing, so every request loads the user row again.
+Reports requests per second and SQL statements per request for both. The
+cached run must send one statement less per request and be no slower.
+Exits with status 1 on a failure.
+"""
+import argparse
+import itertools
+import sys
+import time
+
+from sqlalchemy import event
+
+from benchmarks.cases import Env, _with_timetable
+
+ROUTES = ('/get_active_session', '/api/timetable?limit=50', '/dashboard', '/subjects')
+
+
+def run_route(env, clients, url, seconds):
+    """(requests per second, statements per request) of requesting url in turns for `seconds`."""
+    from models import db
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with env.app.app_context():
+        engine = db.engine
+    for client in clients:
+        client.get(url)  # warm up: templates, per-user caches
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        requests = 0
+        started = time.perf_counter()
+        for client in itertools.cycle(clients):
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+            requests += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= seconds:
+                break
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return requests / elapsed, len(statements) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Authenticated route throughput with and without user_cache.')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--seconds', type=float, default=2)
+    args = parser.parse_args()
+
+    import auth
+    from cache import CachedLoader, TTLCache
+
+    env = Env()
+    failures = []
+    cached = auth.user_cache
+    uncached = CachedLoader(auth._load_user_record, TTLCache(maxsize=0))
+    try:
+        clients = [env.client(_with_timetable(env, 'typical', history=20, seed=seed))
+                   for seed in range(1, args.users + 1)]
+
+        print(f'{"route":<26} {"cached req/s":>13} {"stmts":>6} {"uncached req/s":>15} {"stmts":>6} {"speedup":>8}')
+        for url in ROUTES:
+            auth.user_cache = uncached
+            slow, slow_statements = run_route(env, clients, url, args.seconds)
+            auth.user_cache = cached
+            fast, fast_statements = run_route(env, clients, url, args.seconds)
+            print(f'{url:<26} {fast:>13,.0f} {fast_statements:>6.1f} {slow:>15,.0f} {slow_statements:>6.1f} '
+                  f'{fast / slow:>7.2f}x')
+            if fast_statements > slow_statements - 1 + 1e-9:
+                failures.append(f'{url}: {fast_statements:.1f} statements per request with the cache, '
+                                f'{slow_statements:.1f} without')
+            if fast < slow * 0.9:
+                failures.append(f'{url}: {fast:.0f} req/s with the cache, {slow:.0f} without')
+        print(f'user_cache: {cached.stats()}')
+    finally:
+        auth.user_cache = cached
+        env.close()
+
+    for failure in failures:
+        print('FAIL:', failure)
+    print('FAILED' if failures else 'OK')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
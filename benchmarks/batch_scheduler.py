@@ -0,0 +1,50 @@
+"""
+Cohort planning benchmark: the per-user generate_knapsack_schedule loop
+against batch_scheduler.plan_all.
+
+    python -m benchmarks.batch_scheduler --users 10000 --subjects 8
+"""
+import argparse
+import time
+
+from batch_scheduler import plan_all
+from benchmarks.workload import make_cohort
+from scheduler import generate_knapsack_schedule
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--subjects', type=int, default=8)
+    parser.add_argument('--minutes', type=int, default=240)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    cohort = make_cohort(args.users, args.subjects)
+
+    loop, loop_seconds = timed(lambda: {
+        user_id: generate_knapsack_schedule(subjects, args.minutes)
+        for user_id, subjects in cohort.items()
+    })
+    batch, batch_seconds = timed(lambda: plan_all(cohort, args.minutes, processes=0))
+    pooled, pooled_seconds = timed(lambda: plan_all(cohort, args.minutes, processes=args.processes))
+
+    def ids(plans):
+        return {user_id: [s['subject'].id for s in schedule] for user_id, schedule in plans.items()}
+
+    assert ids(loop) == ids(batch) == ids(pooled), 'batch schedules differ from the per-user loop'
+
+    print(f'{args.users} users x {args.subjects} subjects, {args.minutes} minutes/day')
+    print(f'per-user loop      {loop_seconds:8.2f}s')
+    print(f'batch, 1 process   {batch_seconds:8.2f}s  ({loop_seconds / batch_seconds:.1f}x)')
+    print(f'batch, pool        {pooled_seconds:8.2f}s  ({loop_seconds / pooled_seconds:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+"""
+Benchmark cases. Each case builds its inputs once and returns a Bench: `run`
+is the timed call, `before` (optional) resets state ahead of every run and
+`fingerprint` (optional) reduces the result to something comparable across
+runs, so a rewrite can be checked for identical output as well as speed.
+"""
+import random
+import shutil
+import tempfile
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from benchmarks.workload import make_cohort, populate
+
+Bench = namedtuple('Bench', 'run before fingerprint', defaults=(None, None))
+
+CASES = {}
+
+
+def case(func):
+    CASES[func.__name__] = func
+    return func
+
+
+class Env:
+    """A throwaway app and SQLite database, created on first use."""
+
+    def __init__(self):
+        self._app = None
+        self._tmpdir = None
+
+    @property
+    def app(self):
+        if self._app is None:
+            from app import create_app
+            from models import db
+
+            self._tmpdir = tempfile.mkdtemp(prefix='studyplanner-bench-')
+            self._app = create_app({
+                'TESTING': True,
+                'WTF_CSRF_ENABLED': False,
+                'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self._tmpdir}/bench.db',
+                'JOB_PROCESSES': 0,
+            })
+            with self._app.app_context():
+                db.create_all()
+        return self._app
+
+    def client(self, user_id):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        return client
+
+    def close(self):
+        if self._tmpdir:
+            from models import db
+            with self.app.app_context():
+                db.engine.dispose()
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+
+def _schedule_ids(schedules):
+    return [[item['subject'].id for item in schedule] for schedule in schedules]
+
+
+# ---------------------- Scheduler ---------------------- #
+def _knapsack(profile, users, minutes=240):
+    from scheduler import generate_knapsack_schedule
+
+    problems = list(make_cohort(users, profile=profile).values())
+    return Bench(
+        run=lambda: [generate_knapsack_schedule(subjects, minutes) for subjects in problems],
+        fingerprint=_schedule_ids,
+    )
+
+
+@case
+def knapsack_light(env):
+    return _knapsack('light', 500)
+
+
+@case
+def knapsack_typical(env):
+    return _knapsack('typical', 200)
+
+
+@case
+def knapsack_heavy(env):
+    return _knapsack('heavy', 20, minutes=360)
+
+
+@case
+def knapsack_batch(env):
+    from batch_scheduler import solve_batch
+
+    problems = list(make_cohort(2000, profile='typical').values())
+    return Bench(run=lambda: solve_batch(problems, 240), fingerprint=_schedule_ids)
+
+
+@case
+def plan_horizon_heavy(env):
+    from plan_cache import plans
+    from scheduler import plan_horizon
+
+    subjects = make_cohort(1, profile='heavy')[1]
+    days = max(subject.days_left for subject in subjects)
+    # Measure solving, not plan cache hits from the previous run
+    return Bench(run=lambda: plan_horizon(subjects, days, 360), before=plans.clear,
+                 fingerprint=_schedule_ids)
+
+
+@case
+def plan_horizon_cohort(env):
+    """A cohort whose users mostly share subject setups, starting from an empty plan cache."""
+    from plan_cache import plans
+    from scheduler import plan_horizon
+
+    rng = random.Random(0)
+    setups = list(make_cohort(20, profile='light').values())
+    cohort = [rng.choice(setups) for _ in range(200)]
+    return Bench(
+        run=lambda: [plan_horizon(subjects, 30, 240) for subjects in cohort],
+        before=plans.clear,
+        fingerprint=lambda horizons: [_schedule_ids(horizon) for horizon in horizons],
+    )
+
+
+# ---------------------- Timetable ---------------------- #
+def _users(env, count, profile, seed):
+    """Populate `count` fresh users after the ones already in the database."""
+    from models import db, User
+
+    with env.app.app_context():
+        first = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+        return populate(count, profile=profile, seed=seed, first_user=first)
+
+
+def _timetable_rows(user_id):
+    from models import Subject, TimetableSession
+
+    today = datetime.now().date()
+    # Subjects by position and dates relative to today, so the fingerprint
+    # does not depend on row ids or on the day the benchmark runs
+    position = {
+        subject_id: index for index, (subject_id,) in enumerate(
+            Subject.query.with_entities(Subject.id).filter_by(user_id=user_id).order_by(Subject.id)
+        )
+    }
+    rows = TimetableSession.query.filter_by(user_id=user_id).order_by(
+        TimetableSession.date, TimetableSession.start_time
+    ).all()
+    return [
+        ((row.date - today).days, position[row.subject_id], row.start_time.isoformat(), row.duration)
+        for row in rows
+    ]
+
+
+@case
+def timetable_generation(env):
+    from jobs import generate_timetable_for
+    from models import db, TimetableSession
+
+    user_id, = _users(env, 1, 'heavy', seed=1)
+
+    def before():
+        with env.app.app_context():
+            TimetableSession.query.filter_by(user_id=user_id).delete()
+            db.session.commit()
+
+    def run():
+        with env.app.app_context():
+            generate_timetable_for(user_id)
+            return _timetable_rows(user_id)
+
+    return Bench(run=run, before=before, fingerprint=lambda rows: rows)
+
+
+def _timetable_sync(env, changed_every):
+    """
+    Regenerate a stored 10k-session timetable (1000 days of 10 sessions)
+    with every `changed_every`-th day planned differently (0: none).
+    """
+    from persistence import insert_sessions, sync_timetable
+    from models import db, Subject, TimetableSession
+
+    user_id, = _users(env, 1, 'heavy', seed=4)
+    start = datetime.now().date() + timedelta(days=1)
+    with env.app.app_context():
+        subject_ids = [subject_id for subject_id, in
+                       Subject.query.with_entities(Subject.id).filter_by(user_id=user_id).order_by(Subject.id)]
+
+    def day_rows(offset, shift):
+        day = start + timedelta(days=offset)
+        return [{
+            'user_id': user_id, 'subject_id': subject_ids[(offset + slot + shift) % len(subject_ids)],
+            'date': day, 'start_time': time(8 + slot, 0), 'end_time': time(8 + slot, 45),
+            'duration': 45, 'is_completed': False,
+        } for slot in range(10)]
+
+    stored = [row for offset in range(1000) for row in day_rows(offset, 0)]
+    planned = [row for offset in range(1000)
+               for row in day_rows(offset, 1 if changed_every and offset % changed_every == 0 else 0)]
+
+    def before():
+        with env.app.app_context():
+            TimetableSession.query.filter_by(user_id=user_id).delete()
+            insert_sessions(stored)
+            db.session.commit()
+
+    def run():
+        with env.app.app_context():
+            counts = sync_timetable(user_id, [dict(row) for row in planned], start)
+            db.session.commit()
+            return counts
+
+    return Bench(run=run, before=before, fingerprint=lambda counts: counts)
+
+
+@case
+def timetable_regen_10k(env):
+    return _timetable_sync(env, 0)
+
+
+@case
+def timetable_regen_10k_diff(env):
+    """One day in ten re-planned: 1000 rows replaced, 9000 kept."""
+    return _timetable_sync(env, 10)
+
+
+def _with_timetable(env, profile, history=0, seed=2):
+    """A user with a generated timetable and `history` completed sessions."""
+    from jobs import generate_timetable_for
+    from models import db, TimetableSession, StudySession
+
+    user_id, = _users(env, 1, profile, seed)
+    with env.app.app_context():
+        generate_timetable_for(user_id)
+        rng = random.Random(seed)
+        slots = TimetableSession.query.filter_by(user_id=user_id).limit(history).all()
+        now = datetime.now()
+        for slot in slots:
+            start = now - timedelta(days=rng.randint(0, 30), minutes=rng.randint(0, 600))
+            db.session.add(StudySession(
+                user_id=user_id, subject_id=slot.subject_id, timetable_session_id=slot.id,
+                start_time=start, end_time=start + timedelta(minutes=slot.duration),
+                duration_minutes=slot.duration, units_completed=1, is_completed=True,
+            ))
+            slot.is_completed = True
+        db.session.commit()
+    return user_id
+
+
+def _get(client, url):
+    def run():
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+        return response
+    return run
+
+
+@case
+def timetable_render(env):
+    client = env.client(_with_timetable(env, 'heavy'))
+    return Bench(run=_get(client, '/timetable'))
+
+
+@case
+def timetable_api_page(env):
+    client = env.client(_with_timetable(env, 'heavy'))
+    return Bench(run=_get(client, '/api/timetable?limit=500'))
+
+
+# ---------------------- Dashboard ---------------------- #
+@case
+def dashboard_aggregation(env):
+    import stats
+
+    user_id = _with_timetable(env, 'typical', history=300)
+
+    def run():
+        with env.app.app_context():
+            return stats.overview(user_id)
+
+    return Bench(run=run, fingerprint=lambda overview: sorted(
+        (key, value) for key, value in overview.items() if not key.startswith('minutes_')
+    ))
+
+
+@case
+def dashboard_render(env):
+    client = env.client(_with_timetable(env, 'typical', history=300))
+    return Bench(run=_get(client, '/dashboard'))
+
+
+@case
+def progress_render(env):
+    import stats
+
+    user_id = _with_timetable(env, 'typical', history=300)
+    client = env.client(user_id)
+    get = _get(client, '/progress')
+
+    def run():
+        # Measure the aggregation, not the snapshot cache
+        stats.invalidate_progress(user_id)
+        return get()
+
+    return Bench(run=run)
+
+
+# ---------------------- Study history ---------------------- #
+@case
+def history_heatmap(env):
+    """A year of heatmap and the current streak over 20k completed sessions, read from the rollup."""
+    import rollup
+    from sqlalchemy import insert
+    from models import db, TimetableSession, StudySession
+
+    user_id = _with_timetable(env, 'typical', seed=3)
+    client = env.client(user_id)
+    with env.app.app_context():
+        slot = TimetableSession.query.filter_by(user_id=user_id).first()
+        rng = random.Random(3)
+        now = datetime.now()
+        rows = []
+        for _ in range(20000):
+            end = now - timedelta(days=rng.randint(0, 364), minutes=rng.randint(0, 600))
+            rows.append({
+                'user_id': user_id, 'subject_id': slot.subject_id, 'timetable_session_id': slot.id,
+                'start_time': end - timedelta(minutes=25), 'end_time': end,
+                'duration_minutes': 25, 'units_completed': 1, 'is_completed': True,
+            })
+        db.session.execute(insert(StudySession), rows)
+        db.session.commit()
+        for _ in rollup.backfill():
+            pass
+
+    heatmap = _get(client, f'/api/progress/heatmap?year={now.year}')
+    streak = _get(client, '/api/progress/streak')
+
+    def run():
+        return heatmap().get_json(), streak().get_json()
+
+    # Which days fall in this year depends on today, so there is no stable fingerprint
+    return Bench(run=run)
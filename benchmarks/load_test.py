@@ -0,0 +1,217 @@
+"""
+Mixed read/write load against a real server.
+
+    python -m benchmarks.load_test --clients 16 --requests 2000
+
+Serves the app with a threaded werkzeug server on a file-backed SQLite
+database (WAL, the pooled engine and the lock retries as in production),
+then a pool of client threads, each logged in as one of --users users,
+sends a weighted mix of page loads, API reads, session starts and
+completions and timetable regenerations over HTTP. Reports p50/p99 latency
+per kind of request and overall. Starting a slot that a regeneration just
+replaced answers 404 or 409, as it would for a user; a 5xx answer (a lock
+error that outlasted its retries, say) or a study session whose slot was
+deleted is a failure. Exits with status 1 on a failure.
+"""
+import argparse
+import http.client
+import json
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from benchmarks.workload import populate
+
+# (kind, weight); 'study' is a start followed by the completion of that session
+MIX = (
+    ('dashboard', 25),
+    ('timetable', 15),
+    ('api_timetable', 20),
+    ('active_session', 20),
+    ('progress', 10),
+    ('study', 8),
+    ('regenerate', 2),
+)
+READS = {
+    'dashboard': '/dashboard',
+    'timetable': '/timetable',
+    'api_timetable': '/api/timetable?limit=50',
+    'active_session': '/get_active_session',
+    'progress': '/progress',
+}
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def make_app(directory, threads):
+    from app import create_app
+    from models import db
+
+    app = create_app({
+        'WTF_CSRF_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{directory}/load.db',
+        'JOB_THREADS': threads,
+        'JOB_PROCESSES': 0,
+        # The run itself slows queries down; don't log each one
+        'SLOW_QUERY_MS': None,
+    })
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed(app, users):
+    """Users with a generated timetable; returns {user_id: [pending slot ids]}."""
+    from jobs import generate_timetable_for
+    from models import TimetableSession
+
+    with app.app_context():
+        user_ids = populate(users, profile='typical', seed=0)
+        for user_id in user_ids:
+            generate_timetable_for(user_id)
+        return {
+            user_id: [slot_id for slot_id, in TimetableSession.query.with_entities(TimetableSession.id)
+                      .filter_by(user_id=user_id).order_by(TimetableSession.date.desc())]
+            for user_id in user_ids
+        }
+
+
+def session_cookie(app, user_id):
+    """A signed Flask-Login session for user_id, as the browser would send it."""
+    serializer = app.session_interface.get_signing_serializer(app)
+    value = serializer.dumps({'_user_id': str(user_id), '_fresh': True})
+    return f"{app.config['SESSION_COOKIE_NAME']}={value}"
+
+
+class Client:
+    def __init__(self, port, cookie, slots, lock):
+        self.port = port
+        self.cookie = cookie
+        self.slots = slots
+        self.lock = lock
+
+    def request(self, method, url):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            connection.request(method, url, headers={'Cookie': self.cookie, 'Content-Length': '0'})
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+    def send(self, kind):
+        """Status codes of the requests one unit of `kind` takes."""
+        if kind in READS:
+            return [self.request('GET', READS[kind])[0]]
+        if kind == 'regenerate':
+            return [self.request('POST', '/generate_timetable')[0]]
+        with self.lock:
+            slot_id = self.slots.pop() if self.slots else None
+        if slot_id is None:
+            return [self.request('GET', READS['active_session'])[0]]
+        status, body = self.request('POST', f'/start_session/{slot_id}')
+        if status != 200:
+            return [status]
+        session_id = json.loads(body)['session_id']
+        return [status, self.request('POST', f'/complete_session/{session_id}')[0]]
+
+
+def orphaned_sessions(app):
+    from sqlalchemy import exists
+    from models import StudySession, TimetableSession
+
+    with app.app_context():
+        return StudySession.query.filter(
+            ~exists().where(TimetableSession.id == StudySession.timetable_session_id)
+        ).count()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] * 1000 if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mixed read/write load test over HTTP.')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000, help='units of work across all clients')
+    parser.add_argument('--job-threads', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from jobs import runner
+
+    directory = tempfile.mkdtemp(prefix='studyplanner-load-')
+    failures = []
+    try:
+        app = make_app(directory, args.job_threads)
+        slots = seed(app, args.users)
+        server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        lock = threading.Lock()
+        user_ids = list(slots)
+        clients = [Client(server.server_port, session_cookie(app, user_ids[i % len(user_ids)]),
+                          slots[user_ids[i % len(user_ids)]], lock) for i in range(args.clients)]
+        rng = random.Random(args.seed)
+        kinds, weights = zip(*MIX)
+        work = rng.choices(kinds, weights, k=args.requests)
+
+        latencies = defaultdict(list)
+        statuses = Counter()
+
+        def run(index):
+            client = clients[index % len(clients)]
+            started = time.perf_counter()
+            codes = client.send(work[index])
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies[work[index]].append(elapsed)
+                statuses.update(codes)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.clients) as pool:
+            for future in [pool.submit(run, index) for index in range(args.requests)]:
+                future.result()
+        wall = time.perf_counter() - started
+        server.shutdown()
+        orphans = orphaned_sessions(app)
+
+        everything = [seconds for values in latencies.values() for seconds in values]
+        print(f'{args.requests} units from {args.clients} clients of {args.users} users '
+              f'in {wall:.1f}s ({args.requests / wall:.0f}/s)')
+        print(f'{"kind":<16} {"count":>6} {"p50 ms":>8} {"p99 ms":>8} {"max ms":>8}')
+        for kind, _ in MIX + (('all', 0),):
+            values = everything if kind == 'all' else latencies[kind]
+            print(f'{kind:<16} {len(values):>6} {percentile(values, 0.5):>8.1f} '
+                  f'{percentile(values, 0.99):>8.1f} {percentile(values, 1):>8.1f}')
+        print(f'statuses: {dict(sorted(statuses.items()))}')
+
+        server_errors = sum(count for status, count in statuses.items() if status >= 500)
+        if server_errors:
+            failures.append(f'{server_errors} responses with a 5xx status')
+        if orphans:
+            failures.append(f'{orphans} study sessions lost their timetable slot to a regeneration')
+    finally:
+        runner.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    for failure in failures:
+        print('FAIL:', failure)
+    print('FAILED' if failures else 'OK')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
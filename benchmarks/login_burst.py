@@ -0,0 +1,132 @@
+"""
+Login burst benchmark: many clients log in at the same moment.
+
+    python -m benchmarks.login_burst --clients 200 --processes 0 2 4
+
+Each client is a different user from a different address, so only the
+hashing path limits throughput. Users start with hashes made with cheaper
+parameters than the configured ones, so every first login also pays for
+the transparent rehash. For each --processes value (0 = hash in the web
+thread) it reports throughput, latency percentiles and status counts;
+503s are attempts turned away by HASH_QUEUE_LIMIT, 429s by the throttles.
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+
+PASSWORD = 'correct horse battery staple'
+OLD_METHOD = 'pbkdf2:sha256:1000'
+
+
+def make_app(directory, processes, queue_limit, shared_ip):
+    from app import create_app
+    from models import db
+
+    app = create_app({
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{directory}/login.db',
+        'JOB_PROCESSES': 0,
+        'HASH_PROCESSES': processes,
+        'HASH_QUEUE_LIMIT': queue_limit,
+        # Queries stall behind the burst's own CPU use; don't log each one
+        'SLOW_QUERY_MS': None,
+        # Throttles stay on; with distinct addresses they only bite with --shared-ip
+        'LOGIN_ATTEMPTS_PER_IP': 30 if shared_ip else 10 ** 6,
+    })
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed(app, users):
+    from models import db, User
+
+    # One hash shared by every user: seeding should not take longer than the run
+    password_hash = generate_password_hash(PASSWORD, method=OLD_METHOD)
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {'username': f'user{i}', 'email': f'user{i}@example.com', 'password': password_hash}
+            for i in range(users)
+        ])
+        db.session.commit()
+
+
+def upgraded(app):
+    from hashing import hasher
+    from models import User
+
+    with app.app_context():
+        return sum(user.password.startswith(hasher.method + '$') for user in User.query)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def burst(app, clients, shared_ip):
+    barrier = threading.Barrier(clients)
+
+    def attempt(i):
+        client = app.test_client()
+        address = '10.0.0.1' if shared_ip else f'10.{i // 65536}.{i // 256 % 256}.{i % 256}'
+        barrier.wait()
+        started = time.perf_counter()
+        response = client.post('/login', data={'username': f'user{i}', 'password': PASSWORD},
+                               environ_base={'REMOTE_ADDR': address})
+        return response.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        results = list(pool.map(attempt, range(clients)))
+    return results, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent login benchmark.')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--processes', type=int, nargs='+', default=[0, 2, 4],
+                        help='HASH_PROCESSES values to compare (0 = inline)')
+    parser.add_argument('--queue-limit', type=int, default=64)
+    parser.add_argument('--shared-ip', action='store_true',
+                        help='send every attempt from one address to exercise the throttle')
+    args = parser.parse_args()
+
+    from hashing import hasher
+    from jobs import runner
+
+    print(f'{args.clients} concurrent logins, queue limit {args.queue_limit}')
+    print(f'{"processes":>9} {"wall s":>7} {"logins/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}'
+          f' {"rehashed":>8}  statuses')
+    for processes in args.processes:
+        directory = tempfile.mkdtemp(prefix='studyplanner-login-')
+        try:
+            app = make_app(directory, processes, args.queue_limit, args.shared_ip)
+            seed(app, args.clients)
+            if processes:
+                hasher.hash('warm-up')  # start the pool outside the timed burst
+            results, wall = burst(app, args.clients, args.shared_ip)
+            statuses = Counter(status for status, _ in results)
+            latencies = [seconds * 1000 for _, seconds in results]
+            logged_in = statuses[302]
+            print(f'{processes:>9} {wall:>7.2f} {logged_in / wall:>9.1f} {percentile(latencies, 0.5):>8.0f}'
+                  f' {percentile(latencies, 0.95):>8.0f} {percentile(latencies, 0.99):>8.0f}'
+                  f' {upgraded(app):>8}  {dict(sorted(statuses.items()))}')
+        finally:
+            hasher.shutdown()
+            shutil.rmtree(directory, ignore_errors=True)
+    runner.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Query plan check for the per-user indexes (migration 4c1e7a9d2f60).
+
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --users 500 --verbose   # print every plan
+
+Runs the hot per-user queries from queries.py against a seeded SQLite
+database, captures the SQL they send, and runs EXPLAIN QUERY PLAN on each
+statement with the same parameters. A plan that scans subject,
+timetable_session or study_session instead of searching an index, or that
+sorts the rows in a temporary b-tree, is a failure. Exits with status 1 on
+a failure.
+"""
+import argparse
+import re
+import sys
+from datetime import datetime
+
+from sqlalchemy import event
+
+from benchmarks.cases import Env, _users, _with_timetable
+
+INDEXED_TABLES = ('subject', 'timetable_session', 'study_session')
+FULL_SCAN = re.compile(r'^SCAN (%s)\b' % '|'.join(INDEXED_TABLES))
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def hot_queries(user_id):
+    """(name, call) of the queries the indexes were added for."""
+    import queries
+
+    today = datetime.now().date()
+    first = queries.timetable_page(user_id, limit=5)
+    after = (first[-1].date, first[-1].start_time, first[-1].id) if first else None
+    return [
+        ('user_subjects', lambda: queries.user_subjects(user_id)),
+        ('timetable_for_user', lambda: queries.timetable_for_user(user_id)),
+        ('timetable_for_user (range)', lambda: queries.timetable_for_user(user_id, (today, None))),
+        ('timetable_page', lambda: queries.timetable_page(user_id, limit=50)),
+        ('timetable_page (cursor)', lambda: queries.timetable_page(user_id, after=after, limit=50)),
+        ('recent_sessions', lambda: queries.recent_sessions(user_id)),
+        ('active_session', lambda: queries.active_session(user_id)),
+        ('pending_slots', lambda: queries.pending_slots(user_id, today)),
+        ('taken_slots', lambda: queries.taken_slots(user_id, today, pinned_only=True)),
+    ]
+
+
+def capture(engine, call):
+    """The (statement, parameters) of every SELECT the call sends."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        call()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return statements
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN QUERY PLAN the per-user queries.')
+    parser.add_argument('--users', type=int, default=200, help='other users seeded around the one checked')
+    parser.add_argument('--history', type=int, default=200, help='completed study sessions of the user checked')
+    parser.add_argument('--verbose', action='store_true', help='print the plan of every statement')
+    args = parser.parse_args()
+
+    env = Env()
+    failures = []
+    try:
+        from models import db
+
+        _users(env, args.users // 2, 'typical', seed=1)
+        user_id = _with_timetable(env, 'heavy', history=args.history)
+        _users(env, args.users - args.users // 2, 'typical', seed=3)
+
+        with env.app.app_context():
+            engine = db.engine
+            for name, call in hot_queries(user_id):
+                for statement, parameters in capture(engine, call):
+                    with engine.connect() as connection:
+                        plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+                    details = [row[-1] for row in plan]
+                    problems = [detail for detail in details if FULL_SCAN.match(detail) or detail == TEMP_SORT]
+                    print(f'{"FAIL" if problems else "ok":<4}  {name}')
+                    if args.verbose or problems:
+                        for detail in details:
+                            print(f'        {detail}')
+                    failures.extend(f'{name}: {detail}' for detail in problems)
+                db.session.rollback()
+    finally:
+        env.close()
+
+    for failure in failures:
+        print('FAIL:', failure)
+    print('FAILED' if failures else 'OK')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Rolling-row knapsack against the list-copying one it replaced.
+
+    python -m benchmarks.scheduler_rewrite --subjects 20 100 500 --minutes 240 720 1440
+    python -m benchmarks.scheduler_rewrite --checks 500   # more random value checks
+
+Times generate_knapsack_schedule next to the previous implementation (kept
+below verbatim) on the same subjects, and compares the fatigue-adjusted
+value of their schedules. The rewrite values the k-th session exactly, so
+its schedule is never worth less and is sometimes worth more. Small random
+inputs are also solved by exhaustive search, which the rewrite must match.
+Exits with status 1 on a failure.
+"""
+import argparse
+import itertools
+import random
+import sys
+import time
+
+from benchmarks.workload import make_subjects
+from scheduler import FATIGUE_PENALTY, build_sessions, generate_knapsack_schedule, schedule_value
+
+TOLERANCE = 1e-9
+
+
+def old_knapsack_schedule(subjects, time_limit):
+    """generate_knapsack_schedule before the rewrite."""
+    sessions = []
+    fatigue_penalty = 0.1
+
+    for subject in subjects:
+        base_duration = 30 + (subject.complexity * 10)  # base duration varies with complexity
+        base_value = (6 - subject.priority)  # inverse priority → higher priority = more value
+        sessions.append({
+            'subject': subject,
+            'duration': base_duration,
+            'priority': base_value
+        })
+
+    n = len(sessions)
+    dp = [[0] * (time_limit + 1) for _ in range(n + 1)]
+    selected_map = [[[] for _ in range(time_limit + 1)] for _ in range(n + 1)]
+
+    for i in range(1, n + 1):
+        for t in range(time_limit + 1):
+            current = sessions[i - 1]
+            duration = current['duration']
+
+            if duration <= t:
+                fatigue_level = len(selected_map[i - 1][t - duration])
+                adjusted_value = current['priority'] * (1 - fatigue_penalty * fatigue_level)
+
+                take = adjusted_value + dp[i - 1][t - duration]
+                skip = dp[i - 1][t]
+
+                if take > skip:
+                    dp[i][t] = take
+                    selected_map[i][t] = selected_map[i - 1][t - duration] + [current]
+                else:
+                    dp[i][t] = skip
+                    selected_map[i][t] = selected_map[i - 1][t]
+            else:
+                dp[i][t] = dp[i - 1][t]
+                selected_map[i][t] = selected_map[i - 1][t]
+
+    best_schedule = selected_map[n][time_limit]
+    return best_schedule[::-1]  # return in original order
+
+
+def brute_force_value(subjects, time_limit):
+    """Best fatigue-adjusted value over every subset that fits, in input order."""
+    sessions = build_sessions(subjects)
+    best = 0.0
+    for size in range(1, len(sessions) + 1):
+        if 1 - FATIGUE_PENALTY * (size - 1) <= 0:
+            break
+        for chosen in itertools.combinations(sessions, size):
+            if sum(s['duration'] for s in chosen) <= time_limit:
+                best = max(best, sum(s['priority'] * (1 - FATIGUE_PENALTY * k) for k, s in enumerate(chosen)))
+    return best
+
+
+def timed(solve, subjects, minutes):
+    started = time.perf_counter()
+    schedule = solve(subjects, minutes)
+    return time.perf_counter() - started, schedule_value(schedule)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the knapsack scheduler with its previous implementation.')
+    parser.add_argument('--subjects', type=int, nargs='+', default=[20, 100, 500])
+    parser.add_argument('--minutes', type=int, nargs='+', default=[240, 720, 1440])
+    parser.add_argument('--checks', type=int, default=200, help='random inputs checked by exhaustive search')
+    parser.add_argument('--check-subjects', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    failures = []
+
+    print(f'{"subjects":>8} {"minutes":>7} {"old ms":>9} {"new ms":>9} {"speedup":>8} '
+          f'{"old value":>10} {"new value":>10}')
+    for count in args.subjects:
+        subjects = make_subjects(random.Random(args.seed), 'heavy', count=count)
+        for minutes in args.minutes:
+            old_seconds, old_value = timed(old_knapsack_schedule, subjects, minutes)
+            new_seconds, new_value = timed(generate_knapsack_schedule, subjects, minutes)
+            print(f'{count:>8} {minutes:>7} {old_seconds * 1000:>9.1f} {new_seconds * 1000:>9.1f} '
+                  f'{old_seconds / new_seconds:>7.1f}x {old_value:>10.2f} {new_value:>10.2f}')
+            if new_value < old_value - TOLERANCE:
+                failures.append(f'{count} subjects, {minutes} min: new value {new_value} < old {old_value}')
+
+    rng = random.Random(args.seed)
+    improved = 0
+    for _ in range(args.checks):
+        subjects = make_subjects(rng, 'heavy', count=rng.randint(1, args.check_subjects))
+        minutes = rng.randint(30, 480)
+        best = brute_force_value(subjects, minutes)
+        new_value = schedule_value(generate_knapsack_schedule(subjects, minutes))
+        old_value = schedule_value(old_knapsack_schedule(subjects, minutes))
+        if abs(new_value - best) > TOLERANCE:
+            failures.append(f'{len(subjects)} subjects, {minutes} min: new value {new_value} != optimum {best}')
+        if new_value > old_value + TOLERANCE:
+            improved += 1
+    print(f'exhaustive search: {args.checks} random inputs, the old scheduler missed the optimum on {improved}')
+
+    for failure in failures[:10]:
+        print('FAIL:', failure)
+    print('FAILED' if failures else 'OK')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Solver mode benchmark: solve time and schedule value of the exact DP, the
+FPTAS and the greedy solver across problem sizes.
+
+    python -m benchmarks.solver_modes --subjects 20 100 500 --minutes 240 1440 10080
+    python -m benchmarks.solver_modes --csv solver_modes.csv   # for plotting elsewhere
+
+Each row is one (subjects, minutes) problem. The bars chart solve time on
+a log scale; value is shown relative to the exact optimum, next to the gap
+each mode reports against its own upper bound. The last column is the
+mode 'auto' picks under --budget-ms. Auto passing over the exact DP
+although it solved within the budget and faster than the mode picked is
+a failure (its cost estimate is off). Exits with status 1 on a failure.
+"""
+import argparse
+import csv
+import math
+import random
+import sys
+
+from benchmarks.workload import make_subjects
+from plan_cache import plans
+from scheduler import build_sessions, choose_mode, solve_schedule, _max_useful_sessions
+
+MODES = ('exact', 'fptas', 'greedy')
+BAR_WIDTH = 24
+
+
+def bar(seconds, slowest):
+    # Log scale from 0.1 ms up to the slowest solve
+    low = math.log10(1e-4)
+    high = max(math.log10(slowest), low + 1)
+    filled = round(BAR_WIDTH * (math.log10(max(seconds, 1e-4)) - low) / (high - low))
+    return '#' * max(filled, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Solve time and value per scheduler mode.')
+    parser.add_argument('--subjects', type=int, nargs='+', default=[20, 100, 500])
+    parser.add_argument('--minutes', type=int, nargs='+', default=[240, 1440, 10080])
+    parser.add_argument('--epsilon', type=float, default=0.1)
+    parser.add_argument('--budget-ms', type=float, default=250)
+    parser.add_argument('--exact-limit', type=float, default=30,
+                        help='skip the exact DP when it is predicted to take longer (seconds)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--csv', help='also write the results to this CSV file')
+    args = parser.parse_args()
+    plans.configure(0, None)  # time the solvers, not the plan cache
+
+    rows = []
+    for count in args.subjects:
+        subjects = make_subjects(random.Random(args.seed), 'heavy', count=count)
+        for minutes in args.minutes:
+            sessions = build_sessions(subjects)
+            max_count = _max_useful_sessions(sessions, minutes, 0.1)
+            auto = choose_mode(sessions, minutes, max_count, args.budget_ms / 1000, args.epsilon)
+            exact_guess = choose_mode(sessions, minutes, max_count, args.exact_limit, args.epsilon)
+            results = {}
+            for mode in MODES:
+                if mode == 'exact' and exact_guess != 'exact':
+                    continue
+                results[mode] = solve_schedule(subjects, minutes, mode, epsilon=args.epsilon)
+            rows.append((count, minutes, auto, results))
+
+    slowest = max(solution.seconds for *_, results in rows for solution in results.values())
+    print(f'epsilon {args.epsilon}, auto budget {args.budget_ms:g} ms')
+    print(f'{"subjects":>8} {"minutes":>7} {"mode":<6} {"time ms":>9}  {"":<{BAR_WIDTH}} '
+          f'{"value":>7} {"vs exact":>8} {"gap":>6}  auto')
+    for count, minutes, auto, results in rows:
+        optimum = results['exact'].value if 'exact' in results else None
+        for mode, solution in results.items():
+            relative = f'{solution.value / optimum:8.1%}' if optimum else f'{"-":>8}'
+            print(f'{count:>8} {minutes:>7} {mode:<6} {solution.seconds * 1000:>9.1f}  '
+                  f'{bar(solution.seconds, slowest):<{BAR_WIDTH}} {solution.value:>7.2f} '
+                  f'{relative} {solution.gap:>6.1%}  {"<-" if mode == auto else ""}')
+        if 'exact' not in results:
+            print(f'{count:>8} {minutes:>7} exact  skipped (over --exact-limit)')
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(['subjects', 'minutes', 'mode', 'seconds', 'value', 'bound', 'gap', 'auto'])
+            for count, minutes, auto, results in rows:
+                for mode, solution in results.items():
+                    writer.writerow([count, minutes, mode, f'{solution.seconds:.6f}',
+                                     f'{solution.value:.4f}', f'{solution.bound:.4f}',
+                                     f'{solution.gap:.4f}', int(mode == auto)])
+        print(f'wrote {args.csv}')
+
+    failures = []
+    for count, minutes, auto, results in rows:
+        exact = results.get('exact')
+        if (auto != 'exact' and exact is not None and exact.seconds * 1000 <= args.budget_ms
+                and exact.seconds < results[auto].seconds):
+            failures.append(f'{count} subjects x {minutes} min: auto picked {auto} '
+                            f'({results[auto].seconds * 1000:.1f} ms), exact took {exact.seconds * 1000:.1f} ms')
+    for failure in failures:
+        print('FAIL:', failure)
+    print('FAILED' if failures else 'OK')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Cold start of a web worker.
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --top 30 --depth 2   # more of the -X importtime breakdown
+
+Starts a fresh interpreter per run that imports the app, calls create_app()
+and serves one request (GET /login), and reports the median time to each
+step and the whole process's wall time. One more run under
+`python -X importtime` lists the slowest imports, cumulative. Modules the
+factory is meant to load lazily must still be absent after the first
+request. Exits with status 1 on a failure.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Only needed by the timetable jobs, the CLI and the routes that write
+# timetables, never by a plain request
+LAZY_MODULES = ('scheduler', 'batch_scheduler', 'persistence')
+
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({'SQLALCHEMY_DATABASE_URI': %(uri)r})
+created = time.perf_counter()
+response = app.test_client().get('/login')
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    'import': imported - started, 'create_app': created - imported, 'first_request': served - created,
+    'loaded': [name for name in %(lazy)r if name in sys.modules],
+}))
+'''
+
+
+def run_child(code, *flags):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, *flags, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode:
+        raise RuntimeError(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr, wall
+
+
+def slowest_imports(stderr, top, depth):
+    """(cumulative seconds, module) of the imports in -X importtime output up to `depth` levels deep, slowest first."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented two spaces per level under the module that triggered them
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        if level <= depth:
+            imports.append((int(cumulative) / 1e6, '  ' * level + name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold start time of a web worker.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    parser.add_argument('--depth', type=int, default=1, help='import nesting levels to list (0: top level only)')
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory(prefix='studyplanner-startup-') as directory:
+        code = CHILD % {'uri': f'sqlite:///{directory}/startup.db', 'lazy': LAZY_MODULES}
+        runs = [run_child(code) for _ in range(args.runs)]
+        _, importtime, _ = run_child(code, '-X', 'importtime')
+
+    print(f'median of {args.runs} fresh interpreters:')
+    for step in ('import', 'create_app', 'first_request'):
+        print(f'  {step:<16} {statistics.median(result[step] for result, _, _ in runs) * 1000:8.1f} ms')
+    print(f'  {"process wall":<16} {statistics.median(wall for _, _, wall in runs) * 1000:8.1f} ms')
+    print('slowest imports (python -X importtime, cumulative; nested ones indented):')
+    for seconds, name in slowest_imports(importtime, args.top, args.depth):
+        print(f'  {seconds * 1000:8.1f} ms  {name}')
+
+    loaded = sorted({name for result, _, _ in runs for name in result['loaded']})
+    if loaded:
+        failures.append(f'loaded before they are needed: {", ".join(loaded)}')
+
+    for failure in failures:
+        print('FAIL:', failure)
+    print('FAILED' if failures else 'OK')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Statement counts of the pages that read through queries.py.
+
+    python -m benchmarks.statement_counts
+    python -m benchmarks.statement_counts --history 0 50 500
+
+Seeds one user per size (more subjects, timetable sessions and completed
+study sessions each time) and counts the SQL statements each page sends,
+with a before_cursor_execute hook, on a cold and on a warm request. The
+eager loaders should keep every count the same however many rows the user
+has; a count that grows with the rows (an N+1 query) is a failure. Exits
+with status 1 on a failure.
+"""
+import argparse
+import sys
+
+from sqlalchemy import event
+
+from benchmarks.cases import Env, _with_timetable
+
+PAGES = ('/dashboard', '/subjects', '/timetable', '/api/timetable', '/progress', '/get_active_session')
+# Subject profile of each size, smallest first
+PROFILES = ('light', 'typical', 'heavy')
+
+
+def count_statements(engine, client, url):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert response.status_code == 200, (url, response.status_code)
+    return len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that page statement counts do not grow with rows.')
+    parser.add_argument('--history', type=int, nargs=len(PROFILES), default=[0, 40, 400],
+                        help='completed study sessions of the user of each size')
+    args = parser.parse_args()
+
+    env = Env()
+    failures = []
+    try:
+        from models import db, Subject, TimetableSession, StudySession
+
+        counts = {}
+        sizes = []
+        for seed, (profile, history) in enumerate(zip(PROFILES, args.history), start=1):
+            user_id = _with_timetable(env, profile, history=history, seed=seed)
+            with env.app.app_context():
+                rows = tuple(model.query.filter_by(user_id=user_id).count()
+                             for model in (Subject, TimetableSession, StudySession))
+                engine = db.engine
+            sizes.append(rows)
+            client = env.client(user_id)
+            with env.app.app_context():
+                for url in PAGES:
+                    counts[url, rows] = (count_statements(engine, client, url), count_statements(engine, client, url))
+
+        print(f'{"page":<22}' + ''.join(f'{"%d/%d/%d" % rows:>16}' for rows in sizes))
+        print(f'{"":<22}' + ''.join(f'{"cold warm":>16}' for _ in sizes))
+        for url in PAGES:
+            row = [counts[url, rows] for rows in sizes]
+            print(f'{url:<22}' + ''.join(f'{cold:>11} {warm:>4}' for cold, warm in row))
+            if len(set(row)) > 1:
+                failures.append(f'{url}: statement count changes with rows {row}')
+        print('(columns: subjects/timetable sessions/study sessions of the user)')
+    finally:
+        env.close()
+
+    for failure in failures:
+        print('FAIL:', failure)
+    print('FAILED' if failures else 'OK')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Placement stress test against dense calendars.
+
+    python -m benchmarks.stress_calendar --sessions 100000 --busy 150
+
+Builds one calendar per day with a few availability windows and many
+short busy blocks, then places sessions into every day through
+persistence.place_day and throws random overlap probes at the interval
+index. Every placement and probe is checked against a per-minute
+occupancy map, and the same work is timed with a linear rescan of the
+day's intervals for comparison. Exits with status 1 on a failure.
+"""
+import argparse
+import random
+import sys
+import time as timer
+from collections import namedtuple
+from datetime import date, timedelta
+
+from intervals import DAY_END, day_index, to_minutes, to_time
+from persistence import place_day
+from scheduler import SubjectSpec
+
+Block = namedtuple('Block', 'kind weekday date start_time end_time')
+
+
+def make_calendar(rng, day, busy):
+    """Two or three availability windows and `busy` short busy blocks on one date."""
+    blocks = []
+    start = rng.randint(6 * 60, 9 * 60)
+    for _ in range(rng.randint(2, 3)):
+        end = min(DAY_END, start + rng.randint(150, 300))
+        blocks.append(Block('available', None, day, to_time(start), to_time(end)))
+        start = end + rng.randint(20, 60)
+        if start >= DAY_END - 30:
+            break
+    for _ in range(busy):
+        start = rng.randint(0, DAY_END - 15)
+        blocks.append(Block('busy', None, day, to_time(start), to_time(start + rng.randint(1, 12))))
+    return blocks
+
+
+def occupancy(index):
+    minutes = bytearray(DAY_END)
+    for start, end in index:
+        minutes[start:end] = b'\x01' * (end - start)
+    return minutes
+
+
+def raw_intervals(blocks):
+    """The day's busy time as an unmerged list: outside the windows, then every busy block."""
+    windows = sorted((to_minutes(b.start_time), to_minutes(b.end_time)) for b in blocks if b.kind == 'available')
+    intervals = []
+    cursor = 0
+    for start, end in windows:
+        intervals.append((cursor, start))
+        cursor = max(cursor, end)
+    intervals.append((cursor, DAY_END))
+    intervals.extend((to_minutes(b.start_time), to_minutes(b.end_time)) for b in blocks if b.kind == 'busy')
+    return intervals
+
+
+def rescan_first_fit(intervals, duration, not_before):
+    """The same search as IntervalIndex.first_fit over an unsorted list, rescanned per candidate."""
+    start = not_before
+    while start + duration <= DAY_END:
+        clash = [end for s, end in intervals if s < start + duration and end > start]
+        if not clash:
+            return start
+        start = max(clash)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Place sessions against dense calendars.')
+    parser.add_argument('--sessions', type=int, default=100000)
+    parser.add_argument('--per-day', type=int, default=10, help='sessions tried per day')
+    parser.add_argument('--busy', type=int, default=150, help='busy blocks per day')
+    parser.add_argument('--probes', type=int, default=100000, help='random overlap checks')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    subjects = [SubjectSpec(i, 30, 50, 0, rng.randint(1, 5), rng.randint(1, 5)) for i in range(1, 9)]
+    calendars, schedules, indexes, maps, naive, placed = [], [], [], [], [], []
+    built = placing = 0.0
+    total = 0
+    failures = []
+
+    # Keep adding days until --sessions sessions have been placed
+    day = date.today()
+    while total < args.sessions:
+        blocks = make_calendar(rng, day, args.busy)
+        schedule = [{'subject': rng.choice(subjects), 'duration': rng.randint(5, 30)}
+                    for _ in range(args.per_day)]
+        started = timer.perf_counter()
+        index = day_index(blocks, day)
+        built += timer.perf_counter() - started
+        maps.append(occupancy(index))
+        naive.append(raw_intervals(blocks))
+
+        started = timer.perf_counter()
+        rows = place_day(1, day, schedule, index, break_minutes=5)
+        placing += timer.perf_counter() - started
+
+        calendars.append(blocks)
+        schedules.append(schedule)
+        indexes.append(index)
+        placed.append(rows)
+        total += len(rows)
+        day += timedelta(days=1)
+    days = len(placed)
+
+    for rows, minutes in zip(placed, maps):
+        for row in rows:
+            start, end = to_minutes(row['start_time']), to_minutes(row['end_time'])
+            if any(minutes[start:end]):
+                failures.append(f"{row['date']} {row['start_time']}-{row['end_time']} overlaps")
+            minutes[start:end] = b'\x01' * (end - start)
+
+    # The rescan baseline must make the same placements, only slower
+    sample = max(1, days // 20)
+    rescan_placed = []
+    started = timer.perf_counter()
+    for intervals, schedule in zip(naive[:sample], schedules[:sample]):
+        cursor = 0
+        found = []
+        for item in schedule:
+            start = rescan_first_fit(intervals, item['duration'], cursor)
+            if start is not None:
+                intervals.append((start, start + item['duration']))
+                found.append((start, start + item['duration']))
+                cursor = start + item['duration'] + 5
+        rescan_placed.append(found)
+    rescan = (timer.perf_counter() - started) * days / sample
+    for found, rows in zip(rescan_placed, placed):
+        if found != [(to_minutes(r['start_time']), to_minutes(r['end_time'])) for r in rows]:
+            failures.append(f"rescan placed differently on {rows[0]['date'] if rows else '?'}")
+
+    # Random overlap probes against the filled days
+    started = timer.perf_counter()
+    probes = []
+    for _ in range(args.probes):
+        day = rng.randrange(days)
+        start = rng.randint(0, DAY_END - 1)
+        end = min(DAY_END, start + rng.randint(1, 60))
+        probes.append((day, start, end, indexes[day].overlaps(start, end)))
+    probing = timer.perf_counter() - started
+    for day, start, end, clash in probes:
+        if clash != any(maps[day][start:end]):
+            failures.append(f'overlap probe {start}-{end} on day {day} answered {clash}')
+
+    intervals = sum(len(index) for index in indexes) / days
+    print(f'{days} days, {args.busy} busy blocks/day ({intervals:.0f} merged intervals/day after placement)')
+    print(f'index build    {built * 1000:9.1f} ms')
+    print(f'placement      {placing * 1000:9.1f} ms  {total} sessions placed, '
+          f'{total / placing:,.0f}/s ({days * args.per_day - total} more did not fit)')
+    print(f'rescan (est.)  {rescan * 1000:9.1f} ms  ({rescan / placing:.1f}x slower)')
+    print(f'overlap probes {probing * 1000:9.1f} ms  {args.probes / probing:,.0f}/s')
+    for failure in failures[:20]:
+        print('FAIL:', failure)
+    print('FAILED' if failures else 'OK')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Concurrency stress test for starting and completing study sessions.
+
+    python -m benchmarks.stress_sessions --threads 16 --rounds 20
+
+Many clients of one user hit the same timetable slot at once, first to
+start it and then to complete the resulting session, some of them
+retrying with a shared Idempotency-Key. Afterwards it checks that exactly
+one start and one completion went through per slot, that every retry got
+the original answer, and that no unit update was lost when sessions of
+the same subject complete concurrently. Exits with status 1 on a failure.
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time
+
+from sqlalchemy import insert
+
+
+def make_app(directory):
+    from app import create_app
+    from models import db
+
+    app = create_app({
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{directory}/stress.db',
+        'JOB_PROCESSES': 0,
+    })
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed(app, slots):
+    from models import db, User, Subject, TimetableSession
+
+    with app.app_context():
+        user = User(username='stress', email='stress@example.com', password='-')
+        subject = Subject(user=user, name='Stress', days_left=30, total_units=100000,
+                          completed_units=0, priority=1, complexity=3)
+        db.session.add_all([user, subject])
+        db.session.commit()
+        db.session.execute(insert(TimetableSession), [
+            {'user_id': user.id, 'subject_id': subject.id, 'date': date.today(),
+             'start_time': time(9, 0), 'end_time': time(9, 30), 'duration': 30, 'is_completed': False}
+            for _ in range(slots)
+        ])
+        db.session.commit()
+        slot_ids = [row.id for row in TimetableSession.query.order_by(TimetableSession.id)]
+        return user.id, subject.id, slot_ids
+
+
+def client_for(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def burst(pool, clients, url, keys):
+    """POST `url` from every client at the same moment; returns (status, json) pairs."""
+    barrier = threading.Barrier(len(clients))
+
+    def hit(client, key):
+        headers = {'Idempotency-Key': key} if key else {}
+        barrier.wait()
+        response = client.post(url, headers=headers)
+        return response.status_code, response.get_json()
+
+    return list(pool.map(hit, clients, keys))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrency stress test for study sessions.')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='studyplanner-stress-')
+    failures = []
+    try:
+        app = make_app(directory)
+        user_id, subject_id, slot_ids = seed(app, args.rounds + args.threads)
+        clients = [client_for(app, user_id) for _ in range(args.threads)]
+        from models import db, Subject, StudySession
+
+        with ThreadPoolExecutor(args.threads) as pool:
+            # Same slot, same moment: one start and one completion may win.
+            # Half of the clients share a key, as retries of one request would.
+            for round_number in range(args.rounds):
+                shared = str(uuid.uuid4())
+                keys = [shared if i % 2 else None for i in range(args.threads)]
+                results = burst(pool, clients, f'/start_session/{slot_ids[round_number]}', keys)
+                if any(status >= 500 for status, _ in results):
+                    failures.append(f'round {round_number}: server error on start')
+                started = {body['session_id'] for status, body in results if status == 200}
+                if len(started) != 1:
+                    failures.append(f'round {round_number}: {len(started)} sessions started')
+                    continue
+                session_id = started.pop()
+
+                shared = str(uuid.uuid4())
+                keys = [shared if i % 2 else None for i in range(args.threads)]
+                results = burst(pool, clients, f'/complete_session/{session_id}', keys)
+                if any(status >= 500 for status, _ in results):
+                    failures.append(f'round {round_number}: server error on complete')
+                # Every keyed request is the same logical request
+                succeeded = [status == 200 for status, _ in results]
+                keyed = any(ok for ok, key in zip(succeeded, keys) if key)
+                winners = keyed + sum(ok for ok, key in zip(succeeded, keys) if not key)
+                answers = {(body['units_completed'], body['total_progress'])
+                           for (status, body), key in zip(results, keys) if status == 200 and key}
+                if winners != 1 or len(answers) > 1:
+                    failures.append(f'round {round_number}: {winners} completions, {len(answers)} keyed answers')
+
+            # Different sessions of one subject completing together: no lost updates
+            extra_slots = slot_ids[args.rounds:]
+            client = clients[0]
+            session_ids = []
+            for slot_id in extra_slots:
+                response = client.post(f'/start_session/{slot_id}')
+                session_ids.append(response.get_json()['session_id'])
+            with app.app_context():
+                before = db.session.get(Subject, subject_id).completed_units
+            barrier = threading.Barrier(len(clients))
+
+            def complete(client, session_id):
+                barrier.wait()
+                return client.post(f'/complete_session/{session_id}').get_json()
+
+            results = list(pool.map(complete, clients, session_ids))
+            earned = sum(body['units_completed'] for body in results if body['success'])
+            with app.app_context():
+                after = db.session.get(Subject, subject_id).completed_units
+                open_sessions = StudySession.query.filter_by(is_completed=False).count()
+            if after - before != earned:
+                failures.append(f'lost updates: subject gained {after - before} units, sessions earned {earned}')
+            if open_sessions:
+                failures.append(f'{open_sessions} sessions left open')
+
+        from jobs import runner
+        runner.shutdown()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    for failure in failures:
+        print('FAIL:', failure)
+    print(f'{args.rounds} rounds x {args.threads} threads: {"FAILED" if failures else "OK"}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Synthetic, seeded workloads for the benchmarks."""
+import random
+
+from scheduler import SubjectSpec
+
+# Named shapes of a user's subject list; every field is an inclusive range
+PROFILES = {
+    'light': {'subjects': (3, 5), 'days_left': (5, 30), 'total_units': (5, 30)},
+    'typical': {'subjects': (6, 10), 'days_left': (10, 90), 'total_units': (10, 80)},
+    'heavy': {'subjects': (20, 40), 'days_left': (30, 180), 'total_units': (40, 200)},
+}
+
+
+def make_subjects(rng, profile='typical', first_id=1, count=None):
+    """A random subject list shaped by `profile`, as SubjectSpecs."""
+    shape = PROFILES[profile]
+    count = rng.randint(*shape['subjects']) if count is None else count
+    return [
+        SubjectSpec(
+            first_id + i,
+            rng.randint(*shape['days_left']),
+            rng.randint(*shape['total_units']),
+            0,
+            rng.randint(1, 5),  # priority
+            rng.randint(1, 5),  # complexity
+        )
+        for i in range(count)
+    ]
+
+
+def make_cohort(users, subjects=None, profile='typical', seed=0):
+    """{user_id: [SubjectSpec, ...]} for `users` users with distinct subject ids."""
+    rng = random.Random(seed)
+    cohort = {}
+    next_id = 1
+    for user_id in range(1, users + 1):
+        specs = make_subjects(rng, profile, first_id=next_id, count=subjects)
+        cohort[user_id] = specs
+        next_id += len(specs)
+    return cohort
+
+
+def populate(users, subjects=None, profile='typical', seed=0, first_user=1):
+    """
+    Insert a synthetic cohort into the current app's database and return
+    the user ids, numbered from first_user. Passwords are placeholders;
+    benchmarks log in through the session instead.
+    """
+    from sqlalchemy import insert
+    from models import db, User, Subject
+
+    cohort = make_cohort(users, subjects, profile, seed)
+    user_ids = {user_id: first_user + offset for offset, user_id in enumerate(cohort)}
+    db.session.execute(insert(User), [
+        {'id': uid, 'username': f'bench{uid}', 'email': f'bench{uid}@example.com', 'password': '-'}
+        for uid in user_ids.values()
+    ])
+    db.session.execute(insert(Subject), [
+        {
+            'user_id': user_ids[user_id], 'name': f'Subject {spec.id}',
+            'days_left': spec.days_left, 'total_units': spec.total_units,
+            'completed_units': 0, 'priority': spec.priority, 'complexity': spec.complexity,
+        }
+        for user_id, specs in cohort.items() for spec in specs
+    ])
+    db.session.commit()
+    return list(user_ids.values())
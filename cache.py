@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries expire after `ttl` seconds.
+
+    This is the default backend for CachedLoader. Any other backend only
+    needs get(key) returning None when absent, set(key, value) and
+    delete(key), so a shared store can be plugged in for multi-worker setups.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachedLoader:
+    """
+    Read-through cache in front of `loader(key)` with hit/miss counters.
+    A loader returning None means "not found" and is not cached.
+
+    Writers call invalidate(key) (or update(key, value)) after changing the
+    underlying data. Entries in other processes are only bounded by the
+    backend's TTL unless the backend itself is shared.
+    """
+
+    def __init__(self, loader, backend=None):
+        self.loader = loader
+        self.backend = backend if backend is not None else TTLCache()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = self.loader(key)
+        if value is not None:
+            self.backend.set(key, value)
+        return value
+
+    def update(self, key, value):
+        self.backend.set(key, value)
+
+    def invalidate(self, key):
+        self.backend.delete(key)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,113 @@
+import time as timer
+from datetime import datetime, time, timedelta
+
+import click
+from flask import Blueprint, current_app
+from sqlalchemy import select
+
+from models import db, Subject, TimetableSession
+
+# cli_group=None puts the commands at the top level: `flask plan-all`
+bp = Blueprint('cli', __name__, cli_group=None)
+
+
+def _subjects_by_user():
+    """Every user's subjects as SubjectSpecs, read in one pass."""
+    from scheduler import SubjectSpec
+
+    rows = db.session.execute(
+        select(
+            Subject.user_id, Subject.id, Subject.days_left, Subject.total_units,
+            Subject.completed_units, Subject.priority, Subject.complexity,
+        ).order_by(Subject.user_id, Subject.id)
+    )
+    subjects = {}
+    for user_id, *fields in rows:
+        spec = SubjectSpec(*fields)
+        subjects.setdefault(user_id, []).append(spec._replace(completed_units=spec.completed_units or 0))
+    return subjects
+
+
+@bp.cli.command('plan-all')
+@click.option('--minutes', default=240, show_default=True, help='Study minutes per day.')
+@click.option('--processes', default=None, type=int, help='Worker processes (0 = solve in this process).')
+@click.option('--shard-size', default=2000, show_default=True, help='Users per worker task.')
+@click.option('--dry-run', is_flag=True, help='Solve but do not write any sessions.')
+def plan_all_command(minutes, processes, shard_size, dry_run):
+    """Generate today's schedule for every user in one batch."""
+    from batch_scheduler import plan_all
+    from persistence import layout_day, insert_sessions
+
+    started = timer.perf_counter()
+    subjects = _subjects_by_user()
+    today = datetime.now().date()
+
+    # Users who already have sessions today keep them
+    planned = set(db.session.scalars(
+        select(TimetableSession.user_id).where(TimetableSession.date == today).distinct()
+    ))
+    subjects = {user_id: specs for user_id, specs in subjects.items() if user_id not in planned}
+    db.session.commit()
+    click.echo(f'Planning {len(subjects)} users ({len(planned)} already have a plan for today)')
+
+    plans = plan_all(subjects, minutes, processes=processes, shard_size=shard_size)
+    solved = timer.perf_counter() - started
+
+    rows = []
+    for user_id, schedule in plans.items():
+        rows.extend(layout_day(user_id, today, schedule, time(9, 0)))
+
+    if dry_run:
+        click.echo(f'Solved in {solved:.2f}s; would insert {len(rows)} sessions')
+        return
+
+    insert_sessions(rows)
+    db.session.commit()
+    click.echo(f'Solved in {solved:.2f}s; inserted {len(rows)} sessions '
+               f'in {timer.perf_counter() - started:.2f}s total')
+
+
+@bp.cli.command('rollup-backfill')
+@click.option('--batch-size', default=500, show_default=True, help='Users rebuilt per transaction.')
+def rollup_backfill_command(batch_size):
+    """Rebuild the daily study rollup from completed study sessions."""
+    import rollup
+
+    started = timer.perf_counter()
+    written = 0
+    for done, total, rows in rollup.backfill(batch_size):
+        written += rows
+        click.echo(f'{done}/{total} users, {written} rollup rows ({timer.perf_counter() - started:.1f}s)')
+    click.echo(f'Rollup rebuilt: {written} rows in {timer.perf_counter() - started:.2f}s')
+
+
+@bp.cli.command('archive')
+@click.option('--older-than', default=None, type=int,
+              help='Archive sessions dated more than this many days ago [default: ARCHIVE_AFTER_DAYS].')
+@click.option('--batch-size', default=None, type=int,
+              help='Timetable sessions moved per transaction [default: ARCHIVE_BATCH_SIZE].')
+@click.option('--pause', default=0.0, show_default=True, help='Seconds to wait between batches.')
+@click.option('--dry-run', is_flag=True, help='Only count what would be archived.')
+def archive_command(older_than, batch_size, pause, dry_run):
+    """Move old timetable and study sessions into the compressed archive tables."""
+    import archive
+
+    older_than = current_app.config['ARCHIVE_AFTER_DAYS'] if older_than is None else older_than
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    if older_than < archive.MIN_ARCHIVE_DAYS:
+        raise click.BadParameter(f'must be at least {archive.MIN_ARCHIVE_DAYS} days', param_hint='--older-than')
+
+    started = timer.perf_counter()
+    cutoff = datetime.now().date() - timedelta(days=older_than)
+    slots, sessions, users = archive.pending(cutoff)
+    click.echo(f'{slots} timetable sessions and {sessions} study sessions of {users} users '
+               f'are dated before {cutoff}')
+    if dry_run or not slots:
+        return
+
+    for moved_slots, moved_sessions in archive.archive_before(cutoff, batch_size):
+        click.echo(f'{moved_slots}/{slots} timetable sessions, {moved_sessions} study sessions archived '
+                   f'({timer.perf_counter() - started:.1f}s)')
+        if pause:
+            timer.sleep(pause)
+    click.echo(f'Archived in {timer.perf_counter() - started:.2f}s')
@@ -0,0 +1,66 @@
+import os
+
+from sqlite_profile import DEFAULT_PRAGMAS
+
+
+class Config:
+    """
+    Default settings. SECRET_KEY and DATABASE_URL come from the environment;
+    any other key can be set with a STUDYPLANNER_ prefix, e.g.
+    STUDYPLANNER_SQLITE_POOL_SIZE=20 (values are parsed as JSON when possible).
+    """
+    SECRET_KEY = os.environ.get('SECRET_KEY', '--')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///database.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # SQLite production profile: pooled connections, WAL and lock-wait pragmas
+    SQLITE_PRAGMAS = dict(DEFAULT_PRAGMAS)
+    SQLITE_POOL_SIZE = 10
+    SQLITE_MAX_OVERFLOW = 20
+
+    # Background timetable generation (see jobs.JobRunner)
+    JOB_THREADS = 2
+    JOB_PROCESSES = 2
+
+    # Daily planning strategy (see scheduler.solve_schedule). 'auto' runs the
+    # exact DP when it is predicted to finish within SCHEDULER_BUDGET_MS and
+    # falls back to the FPTAS or greedy solver otherwise; None = no budget.
+    SCHEDULER_MODE = 'auto'
+    SCHEDULER_BUDGET_MS = 250
+    SCHEDULER_EPSILON = 0.1
+    # Solved daily plans shared by users with the same subject setup (see
+    # plan_cache.py); set PLAN_CACHE_PATH to a file to keep them across restarts
+    PLAN_CACHE_SIZE = 4096
+    PLAN_CACHE_PATH = None
+
+    # Password hashing (see hashing.py). Hashes made with other parameters
+    # are upgraded on the user's next login.
+    PASSWORD_HASH_METHOD = 'scrypt:32768:8:1'
+    PASSWORD_SALT_LENGTH = 16
+    HASH_PROCESSES = 2
+    HASH_QUEUE_LIMIT = 64    # queued + running hashes before answering 503
+    HASH_TIMEOUT = 10        # seconds
+    # Login/register attempts allowed per window, per client IP and per username.
+    # Behind a reverse proxy every client has the proxy's address, so set
+    # PROXY_FIX_HOPS to the number of proxies in front of the app (their
+    # X-Forwarded-For is then trusted); otherwise all clients share one IP count
+    PROXY_FIX_HOPS = 0
+    LOGIN_ATTEMPTS_PER_IP = 30
+    LOGIN_ATTEMPTS_PER_USERNAME = 10
+    LOGIN_WINDOW_SECONDS = 60
+
+    # Server-Sent Events (see events.py): each open /events/sessions stream
+    # holds a worker thread, so streams end after SESSION_STREAM_SECONDS and
+    # the browser reconnects. Needs a threaded or gevent worker class.
+    SESSION_STREAM_SECONDS = 300
+
+    # Archiving (see archive.py and `flask archive`): sessions dated more than
+    # ARCHIVE_AFTER_DAYS ago move to compressed archive tables, in
+    # transactions of ARCHIVE_BATCH_SIZE timetable sessions
+    ARCHIVE_AFTER_DAYS = 180
+    ARCHIVE_BATCH_SIZE = 500
+
+    # Instrumentation (see metrics.py): queries at or above SLOW_QUERY_MS go to
+    # the 'studyplanner.slow_query' log; PROFILE_REQUESTS enables ?profile=1
+    SLOW_QUERY_MS = 200
+    PROFILE_REQUESTS = False
@@ -0,0 +1,127 @@
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+# Seconds between pushes on an idle stream: an 'elapsed' event while a
+# session is running, a keep-alive comment otherwise
+TICK_SECONDS = 60
+# A stream ends after this long and the browser reconnects RETRY_MS later,
+# so an open tab holds a worker thread for at most this long at a time
+MAX_STREAM_SECONDS = 300
+RETRY_MS = 5000
+
+
+class SessionEventHub:
+    """
+    In-process pub/sub for study-session events, with one bounded queue per
+    open stream. Only streams served by the same process receive an event.
+    """
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscriber = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers[user_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id, event, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event, data))
+            except queue.Full:
+                # A stalled client must not block the writer
+                pass
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+hub = SessionEventHub()
+
+
+def active_state(study_session):
+    """The fields of an open StudySession that a stream needs to keep."""
+    return {
+        'session_id': study_session.id,
+        'subject_name': study_session.subject.name,
+        'start_time': study_session.start_time.isoformat(),
+        'planned_duration': study_session.timetable_session.duration,
+    }
+
+
+def _active_payload(active):
+    if active is None:
+        return {'has_active_session': False}
+    started = datetime.fromisoformat(active['start_time'])
+    return {
+        'has_active_session': True,
+        'session_id': active['session_id'],
+        'subject_name': active['subject_name'],
+        'elapsed_minutes': int((datetime.now() - started).total_seconds() / 60),
+        'planned_duration': active['planned_duration'],
+    }
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def session_stream(user_id, active, tick=TICK_SECONDS, max_seconds=MAX_STREAM_SECONDS):
+    """
+    Server-Sent Events stream for one user's study session.
+
+    Starts with an 'active' event describing the current state, then relays
+    'start' and 'complete' events from the hub and emits 'elapsed' every
+    tick while a session runs. Elapsed time is computed from the start time
+    held here, so an idle stream never touches the database.
+
+    After max_seconds the stream ends. EventSource reconnects by itself
+    after the 'retry' delay sent first, and the new stream's 'active' event
+    covers anything published in between.
+    """
+    subscriber = hub.subscribe(user_id)
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        yield format_event('active', _active_payload(active))
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                event, data = subscriber.get(timeout=min(tick, remaining))
+            except queue.Empty:
+                if time.monotonic() >= deadline:
+                    return
+                if active is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield format_event('elapsed', _active_payload(active))
+                continue
+
+            if event == 'start':
+                active = data
+                yield format_event('start', _active_payload(active))
+            elif event == 'complete':
+                active = None
+                yield format_event('complete', data)
+    finally:
+        hub.unsubscribe(user_id, subscriber)
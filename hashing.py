@@ -0,0 +1,171 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from cache import TTLCache
+
+
+class HashingBusy(Exception):
+    """Raised when too many hashes are already queued; the client should retry."""
+
+
+# ---------------------- Worker functions ---------------------- #
+# Module level so the process pool can pickle them
+def _hash(password, method, salt_length):
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+
+def _verify(stored_hash, password, method, salt_length):
+    """Check a password; also return a fresh hash if the stored one is outdated."""
+    if not check_password_hash(stored_hash, password):
+        return False, None
+    stored_method, _, rest = stored_hash.partition('$')
+    salt = rest.partition('$')[0]
+    if stored_method == method and len(salt) == salt_length:
+        return True, None
+    return True, _hash(password, method, salt_length)
+
+
+class PasswordHasher:
+    """
+    Runs password KDF work in a bounded process pool, so a burst of logins
+    cannot tie up every web thread or starve other requests of CPU.
+
+    At most `queue_limit` hashes may be queued or running; past that,
+    hash() and verify() raise HashingBusy straight away instead of making
+    the caller wait behind the backlog. A hash still unfinished after
+    `timeout` seconds raises HashingBusy as well, but keeps its place
+    towards the limit until it finishes or is cancelled. With processes=0
+    the work runs in the calling thread, still bounded by the queue limit.
+    """
+
+    def __init__(self, method='scrypt:32768:8:1', salt_length=16, processes=2, queue_limit=64, timeout=10):
+        self.configure(method, salt_length, processes, queue_limit, timeout)
+        self._pool = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def configure(self, method, salt_length, processes, queue_limit, timeout):
+        self.method_setting = method
+        self._method = None
+        self.salt_length = salt_length
+        self.processes = processes
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+
+    @property
+    def method(self):
+        # The method as werkzeug writes it into hashes ('scrypt' -> 'scrypt:32768:8:1'),
+        # so outdated hashes can be recognised by a string comparison
+        if self._method is None:
+            self._method = _hash('', self.method_setting, 1).partition('$')[0]
+        return self._method
+
+    def _run(self, func, *args):
+        with self._lock:
+            if self._pending >= self.queue_limit:
+                raise HashingBusy()
+            self._pending += 1
+            if self.processes and self._pool is None:
+                # spawn: forking a threaded web worker is unsafe
+                self._pool = ProcessPoolExecutor(
+                    self.processes, mp_context=multiprocessing.get_context('spawn')
+                )
+        if not self.processes:
+            try:
+                return func(*args)
+            finally:
+                self._release()
+        try:
+            future = self._pool.submit(func, *args)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the work ends, not when we stop waiting:
+        # a hash that outlives the timeout still holds a worker process
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Drop it if it has not started; nobody is waiting for it any more
+            future.cancel()
+            raise HashingBusy()
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method, self.salt_length)
+
+    def verify(self, stored_hash, password):
+        """
+        Returns (matches, new_hash). new_hash is set when the password
+        matches but was hashed with other parameters than the configured
+        ones; the caller should store it.
+        """
+        return self._run(_verify, stored_hash, password, self.method, self.salt_length)
+
+    def pending(self):
+        return self._pending
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+
+hasher = PasswordHasher()
+
+
+# ---------------------- Throttling ---------------------- #
+class AttemptLimiter:
+    """
+    Fixed-window attempt counter per key (a client IP or a username).
+    Counts live in this process only; limit=0 disables the limiter.
+    """
+
+    def __init__(self, limit, window=60, maxsize=65536):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self.configure(limit, window)
+
+    def configure(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._counts = TTLCache(maxsize=self.maxsize, ttl=window)
+
+    def hit(self, key):
+        """Count an attempt. Returns the seconds to wait if over the limit, else 0."""
+        if not self.limit:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            started, count = self._counts.get(key, (now, 0))
+            if now - started >= self.window:
+                started, count = now, 0
+            count += 1
+            self._counts.set(key, (started, count))
+        if count > self.limit:
+            return max(1, int(started + self.window - now))
+        return 0
+
+
+ip_attempts = AttemptLimiter(30)
+username_attempts = AttemptLimiter(10)
+
+
+def init_app(app):
+    hasher.configure(
+        app.config['PASSWORD_HASH_METHOD'],
+        app.config['PASSWORD_SALT_LENGTH'],
+        app.config['HASH_PROCESSES'],
+        app.config['HASH_QUEUE_LIMIT'],
+        app.config['HASH_TIMEOUT'],
+    )
+    window = app.config['LOGIN_WINDOW_SECONDS']
+    ip_attempts.configure(app.config['LOGIN_ATTEMPTS_PER_IP'], window)
+    username_attempts.configure(app.config['LOGIN_ATTEMPTS_PER_USERNAME'], window)
@@ -0,0 +1,138 @@
+import bisect
+from datetime import time
+
+# Minutes of the day; a session can end at 23:59 at the latest
+DAY_END = 24 * 60 - 1
+# Availability of users who have not declared any weekly windows
+DEFAULT_WINDOWS = ((9 * 60, 22 * 60),)
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def to_time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+class IntervalIndex:
+    """
+    The occupied time of one day as sorted, disjoint [start, end) minute
+    intervals, kept in two parallel lists so lookups are a bisect.
+
+    overlaps() is O(log n). first_fit() is O(log n) plus one step per busy
+    interval it has to skip; placing a day's sessions one after another
+    skips each interval at most once, instead of rescanning every session
+    of the day for each placement.
+    """
+
+    def __init__(self, intervals=()):
+        self._starts = []
+        self._ends = []
+        for start, end in intervals:
+            self.occupy(start, end)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __iter__(self):
+        return zip(self._starts, self._ends)
+
+    def overlaps(self, start, end):
+        if start >= end:
+            return False
+        # Only the last interval starting before `end` can reach past `start`
+        i = bisect.bisect_left(self._starts, end) - 1
+        return i >= 0 and self._ends[i] > start
+
+    def occupy(self, start, end):
+        """Mark [start, end) as taken, merging with the intervals it touches."""
+        if start >= end:
+            return
+        lo = bisect.bisect_left(self._ends, start)
+        hi = bisect.bisect_right(self._starts, end)
+        if lo < hi:
+            start = min(start, self._starts[lo])
+            end = max(end, self._ends[hi - 1])
+        self._starts[lo:hi] = [start]
+        self._ends[lo:hi] = [end]
+
+    def add(self, start, end):
+        """Occupy [start, end) if it is free; returns False on a conflict."""
+        if self.overlaps(start, end):
+            return False
+        self.occupy(start, end)
+        return True
+
+    def first_fit(self, duration, not_before=0, not_after=DAY_END):
+        """Earliest start >= not_before of a free slot of `duration` minutes ending by not_after, or None."""
+        start = not_before
+        i = bisect.bisect_right(self._ends, start)  # first interval ending after start
+        while start + duration <= not_after:
+            if i == len(self._starts) or start + duration <= self._starts[i]:
+                return start
+            start = max(start, self._ends[i])
+            i += 1
+        return None
+
+    def free_minutes(self, lo=0, hi=DAY_END):
+        """Minutes between lo and hi not covered by any interval."""
+        taken = sum(
+            min(end, hi) - max(start, lo)
+            for start, end in zip(self._starts, self._ends)
+            if start < hi and end > lo
+        )
+        return max(0, hi - lo - taken)
+
+    def longest_free(self, lo=0, hi=DAY_END):
+        """Length of the longest free stretch between lo and hi."""
+        longest = 0
+        cursor = lo
+        for start, end in zip(self._starts, self._ends):
+            if end <= cursor:
+                continue
+            if start >= hi:
+                break
+            longest = max(longest, start - cursor)
+            cursor = end
+        return max(longest, hi - cursor)
+
+
+def day_index(blocks, day, taken=()):
+    """
+    IntervalIndex of what is not free on `day` for a user with these
+    calendar blocks (rows with kind, weekday, date, start_time and
+    end_time): the time outside the day's availability windows, busy
+    blocks, and the (start_time, end_time) pairs in `taken`.
+
+    The day's windows are its date-specific 'available' blocks if there
+    are any, else the weekly ones for its weekday, else DEFAULT_WINDOWS
+    when the user has declared no weekly windows at all.
+    """
+    def applies(block):
+        return block.date == day if block.date is not None else block.weekday == day.weekday()
+
+    available = [block for block in blocks if block.kind == 'available']
+    windows = [block for block in available if block.date == day]
+    if not windows:
+        windows = [block for block in available if block.date is None and block.weekday == day.weekday()]
+    if windows:
+        free = IntervalIndex((to_minutes(b.start_time), to_minutes(b.end_time)) for b in windows)
+    elif any(block.date is None for block in available):
+        free = IntervalIndex()  # weekly windows exist, none on this weekday
+    else:
+        free = IntervalIndex(DEFAULT_WINDOWS)
+
+    index = IntervalIndex()
+    cursor = 0
+    for start, end in free:
+        index.occupy(cursor, start)
+        cursor = end
+    index.occupy(cursor, DAY_END)
+
+    for block in blocks:
+        if block.kind == 'busy' and applies(block):
+            index.occupy(to_minutes(block.start_time), to_minutes(block.end_time))
+    for start_time, end_time in taken:
+        index.occupy(to_minutes(start_time), to_minutes(end_time))
+    return index
@@ -0,0 +1,419 @@
+import multiprocessing
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, jsonify
+from flask_login import login_required, current_user
+
+import queries
+import stats
+from models import db, GenerationJob
+from sqlite_profile import retry_on_locked
+
+bp = Blueprint('jobs', __name__)
+
+DAILY_MINUTES = 6 * 60  # 6 hours/day = 360 minutes available
+BREAK_MINUTES = 15  # between two sessions of a day
+# Plans of the horizon tried before sessions that still fit nowhere are dropped
+PLACEMENT_ROUNDS = 4
+# A queued/running job older than this is assumed lost (e.g. the worker died)
+STALE_AFTER = timedelta(minutes=10)
+
+
+class JobRunner:
+    """
+    Runs timetable generation off the request thread.
+
+    A small thread pool drives each job (database reads, progress updates,
+    the final write) and hands the CPU-bound planning to a process pool, so
+    web workers stay responsive. With processes=0 planning runs in the job
+    thread instead. Both pools are created on first use.
+
+    Jobs of one user run one at a time: they wait in a per-user queue, and
+    only the job at its head is handed to the pool, so a pool thread never
+    sits waiting for another job of the same user. A request for a job kind
+    that is already queued for the user returns that job: it has not read
+    anything yet, so it will see the change that triggered the new request.
+    """
+
+    def __init__(self, threads=2, processes=2):
+        self.threads = threads
+        self.processes = processes
+        self._thread_pool = None
+        self._process_pool = None
+        self._queued = {}  # (user_id, kind) -> job id not yet started in this process
+        self._scopes = {}  # job id -> changed subject ids of a re-plan (None: everything)
+        self._pending = {}  # user id -> deque of (job id, kind); present while the user has jobs here
+        self._lock = threading.Lock()
+
+    def configure(self, threads, processes):
+        """Set pool sizes; only takes effect before the first job is submitted."""
+        if self._thread_pool is None:
+            self.threads = threads
+            self.processes = processes
+
+    def _pools(self):
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(self.threads, thread_name_prefix='jobs')
+            if self.processes:
+                from plan_cache import configure as configure_plan_cache, plans
+                # spawn: forking a threaded web worker is unsafe. Workers get
+                # this process's plan cache settings.
+                self._process_pool = ProcessPoolExecutor(
+                    self.processes, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=configure_plan_cache, initargs=(plans.maxsize, plans.path),
+                )
+        return self._thread_pool, self._process_pool
+
+    def submit_timetable(self, user_id):
+        """Queue a full timetable job for the user, or return the one already pending."""
+        return self._submit(user_id, 'timetable')
+
+    def submit_reschedule(self, user_id, subject_id=None):
+        """
+        Queue an incremental re-plan of the user's future days after a change
+        to subject_id (None: to something every day depends on, like the
+        calendar); see reschedule_for. A queued re-plan takes on the subject.
+        """
+        return self._submit(user_id, 'reschedule', subject_id)
+
+    def _join_queued(self, user_id, kind, subject_id):
+        """The queued job of this kind with the subject added to its scope, or None. Needs _lock."""
+        job_id = self._queued.get((user_id, kind))
+        if job_id is not None:
+            scope = self._scopes.get(job_id)
+            if scope is not None:
+                if subject_id is None:
+                    self._scopes[job_id] = None
+                else:
+                    scope.add(subject_id)
+        return job_id
+
+    def _submit(self, user_id, kind, subject_id=None):
+        # The database is only used outside _lock: a write can wait on
+        # SQLite's busy_timeout, and every submit goes through that lock
+        with self._lock:
+            job_id = self._join_queued(user_id, kind, subject_id)
+            if job_id is not None:
+                return job_id
+            idle_here = user_id not in self._pending
+
+        if kind == 'timetable' and idle_here:
+            # Another process may already be working on it
+            job_id = _active_job(user_id, kind)
+            if job_id is not None:
+                return job_id
+
+        job_id = _create_job(user_id, kind)
+        app = current_app._get_current_object()
+        with self._lock:
+            queued = self._join_queued(user_id, kind, subject_id)
+            if queued is None:
+                self._queued[(user_id, kind)] = job_id
+                self._scopes[job_id] = {subject_id} if subject_id is not None else None
+                pending = self._pending.setdefault(user_id, deque())
+                pending.append((job_id, kind))
+                if len(pending) == 1:
+                    self._pools()[0].submit(self._run_next, app, user_id)
+                return job_id
+
+        # A concurrent request queued the same job first
+        _update(job_id, status='done', progress=100, message=f'Merged into job {queued}',
+                finished_at=datetime.now())
+        return queued
+
+    def plan(self, subjects, days, minutes_per_day, first_day=0):
+        from plan_cache import plans
+        from scheduler import plan_horizon
+        _, process_pool = self._pools()
+        args = (subjects, days, minutes_per_day, first_day, *solver_options())
+        if process_pool is None:
+            return plan_horizon(*args)
+        horizon, cache_counts = process_pool.submit(_plan_in_worker, *args).result()
+        plans.add_counts(cache_counts)
+        return horizon
+
+    def _run_next(self, app, user_id):
+        """Run the job at the head of the user's queue, then hand the next one to the pool."""
+        with self._lock:
+            job_id, kind = self._pending[user_id][0]
+            self._queued.pop((user_id, kind), None)
+            scope = self._scopes.pop(job_id, None)
+        try:
+            with app.app_context():
+                self._run(job_id, user_id, kind, scope)
+        finally:
+            with self._lock:
+                pending = self._pending[user_id]
+                pending.popleft()
+                if pending:
+                    # Behind the other users' jobs already waiting for a thread
+                    self._thread_pool.submit(self._run_next, app, user_id)
+                else:
+                    del self._pending[user_id]
+
+    def _run(self, job_id, user_id, kind, scope):
+        try:
+            _update(job_id, status='running', progress=5, message='Loading subjects')
+            report = lambda progress, message: _update(job_id, progress=progress, message=message)
+            if kind == 'timetable':
+                result = generate_timetable_for(user_id, report, plan=self.plan)
+            else:
+                result = reschedule_for(user_id, report, plan=self.plan, subject_ids=scope)
+            stats.invalidate_progress(user_id)
+            _update(job_id, status='done', progress=100, message='Timetable ready',
+                    result=result, finished_at=datetime.now())
+        except Exception as exc:
+            db.session.rollback()
+            current_app.logger.exception('%s job %s failed', kind.capitalize(), job_id)
+            _update(job_id, status='failed', message=str(exc)[:200], finished_at=datetime.now())
+        finally:
+            db.session.remove()
+
+    def shutdown(self, wait=True):
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=wait)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait)
+        self._thread_pool = self._process_pool = None
+
+
+runner = JobRunner()
+
+
+def _plan_in_worker(*args):
+    """plan_horizon in a pool worker, plus the worker's plan cache counts for /metrics."""
+    from plan_cache import plans
+    from scheduler import plan_horizon
+    return plan_horizon(*args), plans.take_counts()
+
+
+def solver_options():
+    """(mode, budget in seconds, epsilon) for scheduler.solve_schedule from the app config."""
+    budget_ms = current_app.config['SCHEDULER_BUDGET_MS']
+    return (
+        current_app.config['SCHEDULER_MODE'],
+        budget_ms / 1000 if budget_ms is not None else None,
+        current_app.config['SCHEDULER_EPSILON'],
+    )
+
+
+@retry_on_locked
+def _active_job(user_id, kind):
+    """
+    Id of a recent queued or running job of this kind for the user, e.g. in
+    another process, or None. A stale one is marked failed.
+    """
+    job = GenerationJob.query.filter(
+        GenerationJob.user_id == user_id,
+        GenerationJob.kind == kind,
+        GenerationJob.status.in_(('queued', 'running')),
+    ).order_by(GenerationJob.id.desc()).first()
+    if job is None or job.created_at > datetime.now() - STALE_AFTER:
+        job_id = job.id if job is not None else None
+        db.session.commit()
+        return job_id
+    job.status = 'failed'
+    job.message = 'Abandoned'
+    job.finished_at = datetime.now()
+    db.session.commit()
+    return None
+
+
+@retry_on_locked
+def _create_job(user_id, kind):
+    job = GenerationJob(user_id=user_id, kind=kind, message='Queued')
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+@retry_on_locked
+def _update(job_id, **fields):
+    GenerationJob.query.filter_by(id=job_id).update(fields)
+    db.session.commit()
+
+
+def generate_timetable_for(user_id, report=None, plan=None, first_day=0, last_day=None):
+    """
+    Plan the user's exam horizon and sync it into the timetable.
+    `report(progress, message)` receives progress updates; `plan` runs the
+    planner (defaults to calling it in-process).
+
+    With first_day > 0 only the days from today + first_day on are
+    re-planned; sessions still pending before that day are assumed to be
+    done as planned. With last_day, the re-plan stops at today + last_day
+    (inclusive). The pending sessions after it stay and count as done too,
+    so only that range is read, solved and rewritten.
+
+    Past days, completed sessions and slots with a study session are never
+    touched (see persistence.sync_timetable). New sessions are placed
+    around them, inside the user's availability windows and outside their
+    busy blocks.
+
+    Returns the inserted/deleted/kept counts and the number of planned
+    sessions that fit nowhere ('unplaced'), or None without subjects.
+    """
+    from intervals import day_index
+    from scheduler import plan_horizon, subject_spec, units_for_session
+    from persistence import place_day, sync_timetable
+
+    report = report or (lambda progress, message: None)
+    plan = plan or plan_horizon
+
+    today = datetime.now().date()
+    start_date = today + timedelta(days=first_day)
+    end_date = today + timedelta(days=last_day) if last_day is not None else None
+    subjects = [subject_spec(subject) for subject in queries.user_subjects(user_id)]
+
+    if first_day or end_date is not None:
+        # Credit the units of the sessions still planned outside the range
+        complexity = {subject.id: subject.complexity for subject in subjects}
+        expected = defaultdict(int)
+        outside = []
+        if first_day:
+            outside += queries.pending_slots(user_id, today, start_date - timedelta(days=1))
+        if end_date is not None:
+            outside += queries.pending_slots(user_id, end_date + timedelta(days=1))
+        for subject_id, duration in outside:
+            if subject_id in complexity:
+                expected[subject_id] += units_for_session(duration, complexity[subject_id])
+        subjects = [
+            subject._replace(completed_units=(subject.completed_units or 0) + expected[subject.id])
+            for subject in subjects
+        ]
+
+    blocks = queries.calendar_blocks(user_id)
+    pinned = defaultdict(list)
+    for day, start_time, end_time in queries.taken_slots(user_id, start_date, end_date, pinned_only=True):
+        pinned[day].append((start_time, end_time))
+
+    db.session.commit()  # end the read transaction before the long solve
+    if not subjects and not first_day:
+        return None
+
+    report(20, 'Planning study sessions')
+    days = max((subject.days_left for subject in subjects), default=first_day)
+    if last_day is not None:
+        days = min(days, last_day + 1)
+
+    # A day is never planned past its free time
+    dates = [start_date + timedelta(days=i) for i in range(max(0, days - first_day))]
+    capacities = [min(DAILY_MINUTES, day_index(blocks, day, pinned[day]).free_minutes()) for day in dates]
+
+    # The planner only sees each day's free minutes, not the breaks between
+    # sessions or how the free time is split up, so a day's plan may not fit.
+    # Such a day is planned again with the minutes that did fit (its longest
+    # free stretch if none did); each round lowers the capacity of the days
+    # that overflowed, and the later days absorb the units they give back.
+    for _ in range(PLACEMENT_ROUNDS):
+        horizon = plan(subjects, max(days, first_day), capacities, first_day)
+        rows = []
+        unplaced = 0
+        for i, (day, daily_schedule) in enumerate(zip(dates, horizon)):
+            index = day_index(blocks, day, pinned[day])
+            longest = index.longest_free()
+            placed = place_day(user_id, day, daily_schedule, index, break_minutes=BREAK_MINUTES)
+            rows.extend(placed)
+            if len(placed) < len(daily_schedule):
+                unplaced += len(daily_schedule) - len(placed)
+                capacities[i] = sum(row['duration'] for row in placed) or min(longest, capacities[i] - 1)
+        if not unplaced:
+            break
+
+    report(70, 'Saving timetable')
+
+    @retry_on_locked
+    def save():
+        # Only rows that differ from the stored timetable are deleted or inserted
+        changes = sync_timetable(user_id, rows, start_date, end_date)
+        db.session.commit()
+        return dict(changes, unplaced=unplaced)
+
+    return save()
+
+
+def _affected_days(user_id, subject_ids, today):
+    """
+    Last day (as an offset from today) on which a change to these subjects
+    can move sessions, or None if it cannot move any after today.
+
+    A subject with more units left than the old plan covers from tomorrow
+    on may need every day up to its deadline; otherwise its sessions only
+    shrink or vanish, all on or before the last day it was planned for.
+    A deleted subject only has its planned sessions to clear.
+    """
+    from scheduler import units_for_session
+
+    subjects = {subject.id: subject for subject in queries.user_subjects(user_id)}
+    planned = defaultdict(list)
+    for subject_id, day, duration in queries.subject_slots(user_id, subject_ids, today):
+        planned[subject_id].append((day, duration))
+
+    last = None
+    for subject_id in subject_ids:
+        future = [day for day, _ in planned[subject_id] if day > today]
+        end = max(future) if future else None
+        subject = subjects.get(subject_id)
+        if subject is not None:
+            units = lambda day_filter: sum(
+                units_for_session(duration, subject.complexity)
+                for day, duration in planned[subject_id] if day_filter(day)
+            )
+            # Today stays as planned, so its sessions count as done
+            left = subject.total_units - (subject.completed_units or 0) - units(lambda day: day == today)
+            if left > units(lambda day: day > today):
+                end = today + timedelta(days=subject.days_left - 1)
+        if end is not None and end > today and (last is None or end > last):
+            last = end
+    return (last - today).days if last is not None else None
+
+
+def reschedule_for(user_id, report=None, plan=None, subject_ids=None):
+    """
+    Re-plan the user's timetable from tomorrow on after a change to their
+    subjects or progress. Today stays as planned, and days whose plan comes
+    out unchanged keep their rows, so only the affected days are rewritten.
+
+    With subject_ids, only the days those subjects can affect are re-planned
+    (see _affected_days), so the work grows with the change rather than
+    with the horizon; without, every day from tomorrow on.
+
+    Returns the inserted/deleted/kept counts, or None without a timetable
+    or when nothing after today is affected.
+    """
+    today = datetime.now().date()
+    if not queries.has_timetable_from(user_id, today + timedelta(days=1)):
+        db.session.commit()
+        return None
+    last_day = None
+    if subject_ids is not None:
+        last_day = _affected_days(user_id, subject_ids, today)
+        if last_day is None:
+            db.session.commit()
+            return None
+    return generate_timetable_for(user_id, report, plan, first_day=1, last_day=last_day)
+
+
+def job_json(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.message,
+        'result': job.result,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+@bp.route('/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    job = db.session.get(GenerationJob, job_id)
+    if job is None or job.user_id != current_user.id:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify(job_json(job))
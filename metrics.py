@@ -0,0 +1,218 @@
+import cProfile
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, g, has_app_context, has_request_context, request
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+
+bp = Blueprint('metrics', __name__)
+
+slow_query_log = logging.getLogger('studyplanner.slow_query')
+
+# Prometheus' default latency buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the shape Prometheus expects."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            yield ('+Inf' if bound == float('inf') else repr(bound)), running
+
+
+class RequestMetrics:
+    """
+    Per-endpoint request latency, SQL and template time for this process.
+
+    Each request collects its SQL statement count and time (from cursor
+    events) and its template render time (from Flask's render signals) in
+    `g`, and folds them into the endpoint's totals when the response goes
+    out. The totals are rendered at /metrics in Prometheus text format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(Histogram)           # (endpoint, method) -> Histogram
+        self.responses = defaultdict(int)               # (endpoint, method, status) -> count
+        self.sql_statements = defaultdict(int)          # endpoint -> count
+        self.sql_seconds = defaultdict(float)           # endpoint -> seconds
+        self.template_seconds = defaultdict(float)      # endpoint -> seconds
+        self.slow_queries = 0
+        self.caches = {}
+
+    def init_app(self, app):
+        app.config.setdefault('SLOW_QUERY_MS', 200)
+        app.config.setdefault('PROFILE_REQUESTS', False)
+        app.config.setdefault('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+
+        from models import db
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor_execute)
+
+        app.register_blueprint(bp)
+
+    def watch_cache(self, name, loader):
+        """Export a CachedLoader's hit/miss counters under the given name."""
+        self.caches[name] = loader
+
+    # ---------------------- Request hooks ---------------------- #
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.sql_statements = 0
+        g.sql_seconds = 0.0
+        g.template_seconds = 0.0
+        g.template_starts = []
+        if current_app.config['PROFILE_REQUESTS'] and request.args.get('profile') == '1':
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    def _after_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            response.headers['X-Profile'] = self._dump_profile(profiler)
+
+        endpoint = request.endpoint or 'unmatched'
+        with self._lock:
+            self.latency[(endpoint, request.method)].observe(elapsed)
+            self.responses[(endpoint, request.method, response.status_code)] += 1
+            self.sql_statements[endpoint] += g.sql_statements
+            self.sql_seconds[endpoint] += g.sql_seconds
+            self.template_seconds[endpoint] += g.template_seconds
+
+        response.headers['Server-Timing'] = ', '.join((
+            f'sql;desc="{g.sql_statements} queries";dur={g.sql_seconds * 1000:.1f}',
+            f'tpl;dur={g.template_seconds * 1000:.1f}',
+            f'total;dur={elapsed * 1000:.1f}',
+        ))
+        return response
+
+    def _dump_profile(self, profiler):
+        directory = current_app.config['PROFILE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        name = f"{request.endpoint or 'unmatched'}-{datetime.now():%Y%m%d-%H%M%S-%f}.prof"
+        path = os.path.join(directory, name)
+        profiler.dump_stats(path)
+        return path
+
+    def _before_render(self, app, template, context, **extra):
+        if 'template_starts' in g:
+            g.template_starts.append(time.perf_counter())
+
+    def _after_render(self, app, template, context, **extra):
+        if g.get('template_starts'):
+            g.template_seconds += time.perf_counter() - g.template_starts.pop()
+
+    # ---------------------- SQL hooks ---------------------- #
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+
+        in_request = has_request_context() and 'sql_statements' in g
+        if in_request:
+            g.sql_statements += 1
+            g.sql_seconds += elapsed
+
+        threshold = current_app.config['SLOW_QUERY_MS'] if has_app_context() else None
+        if threshold is not None and elapsed * 1000 >= threshold:
+            with self._lock:
+                self.slow_queries += 1
+            slow_query_log.warning(
+                '%.1f ms [%s] %s', elapsed * 1000,
+                request.endpoint if in_request else 'background', ' '.join(statement.split()),
+            )
+
+    # ---------------------- Exposition ---------------------- #
+    def render(self):
+        """All metrics in Prometheus text exposition format."""
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            header('studyplanner_request_duration_seconds', 'histogram', 'Request latency by endpoint.')
+            for (endpoint, method), histogram in sorted(self.latency.items()):
+                labels = f'endpoint="{endpoint}",method="{method}"'
+                for bound, count in histogram.cumulative():
+                    lines.append(f'studyplanner_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'studyplanner_request_duration_seconds_sum{{{labels}}} {histogram.total}')
+                lines.append(f'studyplanner_request_duration_seconds_count{{{labels}}} {histogram.count}')
+
+            header('studyplanner_responses_total', 'counter', 'Responses by endpoint and status.')
+            for (endpoint, method, status), count in sorted(self.responses.items()):
+                lines.append(
+                    f'studyplanner_responses_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}'
+                )
+
+            for name, kind, values, help_text in (
+                ('studyplanner_sql_statements_total', 'counter', self.sql_statements,
+                 'SQL statements executed while serving the endpoint.'),
+                ('studyplanner_sql_seconds_total', 'counter', self.sql_seconds,
+                 'Time spent in SQL while serving the endpoint.'),
+                ('studyplanner_template_seconds_total', 'counter', self.template_seconds,
+                 'Time spent rendering templates for the endpoint.'),
+            ):
+                header(name, kind, help_text)
+                for endpoint, value in sorted(values.items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {value}')
+
+            header('studyplanner_slow_queries_total', 'counter', 'Queries slower than SLOW_QUERY_MS.')
+            lines.append(f'studyplanner_slow_queries_total {self.slow_queries}')
+
+        caches = sorted((name, loader.stats()) for name, loader in self.caches.items())
+        if caches:
+            header('studyplanner_cache_hits_total', 'counter', 'Cache lookups served from the cache.')
+            for name, cache_stats in caches:
+                lines.append(f'studyplanner_cache_hits_total{{cache="{name}"}} {cache_stats["hits"]}')
+            header('studyplanner_cache_misses_total', 'counter', 'Cache lookups that called the loader.')
+            for name, cache_stats in caches:
+                lines.append(f'studyplanner_cache_misses_total{{cache="{name}"}} {cache_stats["misses"]}')
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = RequestMetrics()
+
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
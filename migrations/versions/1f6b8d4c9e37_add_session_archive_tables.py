@@ -0,0 +1,54 @@
+"""Add session archive tables and an index on study sessions by timetable slot
+
+Revision ID: 1f6b8d4c9e37
+Revises: e8f1d3b6a472
+Create Date: 2026-10-18 05:02:44.731905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1f6b8d4c9e37'
+down_revision = 'e8f1d3b6a472'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('timetable_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('sessions', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'month', name='uq_timetable_archive_user_month')
+    )
+    op.create_table('study_session_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('subject_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('sessions', sa.Integer(), nullable=False),
+    sa.Column('minutes', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['subject_id'], ['subject.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'subject_id', 'month', name='uq_study_session_archive_user_subject_month')
+    )
+    with op.batch_alter_table('study_session', schema=None) as batch_op:
+        batch_op.create_index('ix_study_session_timetable_session', ['timetable_session_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('study_session', schema=None) as batch_op:
+        batch_op.drop_index('ix_study_session_timetable_session')
+
+    op.drop_table('study_session_archive')
+    op.drop_table('timetable_archive')
@@ -0,0 +1,32 @@
+"""Scope idempotency keys per user
+
+Revision ID: 3b9e2d7c5a14
+Revises: 1f6b8d4c9e37
+Create Date: 2026-10-18 09:14:52.306118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9e2d7c5a14'
+down_revision = '1f6b8d4c9e37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('study_session', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_study_session_complete_key', type_='unique')
+        batch_op.drop_constraint('uq_study_session_start_key', type_='unique')
+        batch_op.create_unique_constraint('uq_study_session_user_start_key', ['user_id', 'start_key'])
+        batch_op.create_unique_constraint('uq_study_session_user_complete_key', ['user_id', 'complete_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('study_session', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_study_session_user_complete_key', type_='unique')
+        batch_op.drop_constraint('uq_study_session_user_start_key', type_='unique')
+        batch_op.create_unique_constraint('uq_study_session_start_key', ['start_key'])
+        batch_op.create_unique_constraint('uq_study_session_complete_key', ['complete_key'])
@@ -0,0 +1,60 @@
+"""Add per-user query indexes
+
+Revision ID: 4c1e7a9d2f60
+Revises: b3810a398eb1
+Create Date: 2026-10-17 10:12:43.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1e7a9d2f60'
+down_revision = 'b3810a398eb1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Close duplicate open sessions on the same slot (all but the oldest) so
+    # the unique index can be built. They stay in the history as completed
+    # sessions of zero minutes that earned no units, so progress is unchanged
+    op.execute(
+        """
+        UPDATE study_session
+        SET is_completed = 1, end_time = start_time, duration_minutes = 0, units_completed = 0
+        WHERE is_completed = 0
+          AND id NOT IN (
+              SELECT MIN(id) FROM study_session
+              WHERE is_completed = 0
+              GROUP BY timetable_session_id
+          )
+        """
+    )
+
+    with op.batch_alter_table('subject', schema=None) as batch_op:
+        batch_op.create_index('ix_subject_user_id', ['user_id'], unique=False)
+
+    with op.batch_alter_table('timetable_session', schema=None) as batch_op:
+        batch_op.create_index('ix_timetable_session_user_date_start', ['user_id', 'date', 'start_time'], unique=False)
+
+    with op.batch_alter_table('study_session', schema=None) as batch_op:
+        batch_op.create_index('ix_study_session_user_completed_end', ['user_id', 'is_completed', 'end_time'], unique=False)
+        batch_op.create_index(
+            'uq_study_session_open_slot', ['timetable_session_id'], unique=True,
+            sqlite_where=sa.text('is_completed = 0'),
+            postgresql_where=sa.text('NOT is_completed'),
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('study_session', schema=None) as batch_op:
+        batch_op.drop_index('uq_study_session_open_slot')
+        batch_op.drop_index('ix_study_session_user_completed_end')
+
+    with op.batch_alter_table('timetable_session', schema=None) as batch_op:
+        batch_op.drop_index('ix_timetable_session_user_date_start')
+
+    with op.batch_alter_table('subject', schema=None) as batch_op:
+        batch_op.drop_index('ix_subject_user_id')
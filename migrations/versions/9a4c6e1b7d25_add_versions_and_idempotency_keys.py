@@ -0,0 +1,40 @@
+"""Add version columns and idempotency keys
+
+Revision ID: 9a4c6e1b7d25
+Revises: 7d2b9e4f1a83
+Create Date: 2026-10-17 23:20:41.508113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c6e1b7d25'
+down_revision = '7d2b9e4f1a83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('subject', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+    with op.batch_alter_table('study_session', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('start_key', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('complete_key', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        batch_op.create_unique_constraint('uq_study_session_start_key', ['start_key'])
+        batch_op.create_unique_constraint('uq_study_session_complete_key', ['complete_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('study_session', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_study_session_complete_key', type_='unique')
+        batch_op.drop_constraint('uq_study_session_start_key', type_='unique')
+        batch_op.drop_column('version')
+        batch_op.drop_column('complete_key')
+        batch_op.drop_column('start_key')
+
+    with op.batch_alter_table('subject', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,39 @@
+"""Add calendar blocks (availability windows and busy blocks)
+
+Revision ID: c5e2a7f9d031
+Revises: 9a4c6e1b7d25
+Create Date: 2026-10-18 01:12:37.204519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e2a7f9d031'
+down_revision = '9a4c6e1b7d25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('calendar_block',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('weekday', sa.Integer(), nullable=True),
+    sa.Column('date', sa.Date(), nullable=True),
+    sa.Column('start_time', sa.Time(), nullable=False),
+    sa.Column('end_time', sa.Time(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('calendar_block', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_calendar_block_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('calendar_block', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_calendar_block_user_id'))
+
+    op.drop_table('calendar_block')
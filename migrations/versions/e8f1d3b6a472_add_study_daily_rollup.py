@@ -0,0 +1,35 @@
+"""Add study_daily_rollup table
+
+Revision ID: e8f1d3b6a472
+Revises: c5e2a7f9d031
+Create Date: 2026-10-18 03:41:09.518274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8f1d3b6a472'
+down_revision = 'c5e2a7f9d031'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('study_daily_rollup',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('subject_id', sa.Integer(), nullable=False),
+    sa.Column('minutes', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('sessions', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['subject_id'], ['subject.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'day', 'subject_id')
+    )
+    # Existing history is loaded with `flask rollup-backfill`
+
+
+def downgrade():
+    op.drop_table('study_daily_rollup')
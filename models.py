@@ -0,0 +1,183 @@
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+from flask_login import UserMixin
+
+db = SQLAlchemy()
+
+# ---------------------- Models ---------------------- #
+class User(UserMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(100), unique=True, nullable=False)
+    email = db.Column(db.String(100), unique=True, nullable=False)
+    password = db.Column(db.String(200), nullable=False)
+    subjects = db.relationship('Subject', backref='user', lazy=True)
+
+class UserRecord(UserMixin):
+    """Detached copy of a User's identity fields, safe to cache across requests."""
+
+    def __init__(self, id, username, email):
+        self.id = id
+        self.username = username
+        self.email = email
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.email)
+
+class Subject(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    days_left = db.Column(db.Integer, nullable=False)
+    total_units = db.Column(db.Integer, nullable=False)
+    completed_units = db.Column(db.Integer, default=0)
+    priority = db.Column(db.Integer, nullable=False)
+    complexity = db.Column(db.Integer, nullable=False)
+    # Bumped on every update; ORM writes fail with StaleDataError if it moved
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
+
+    @property
+    def progress_percent(self):
+        if self.total_units > 0:
+            return round((self.completed_units / self.total_units) * 100, 1)
+        return 0.0
+
+    @property
+    def priority_label(self):
+        return {1: 'Highest', 2: 'High', 3: 'Medium', 4: 'Low', 5: 'Lowest'}.get(self.priority, 'Unknown')
+
+    @property
+    def complexity_label(self):
+        return {1: 'Very Easy', 2: 'Easy', 3: 'Medium', 4: 'Hard', 5: 'Very Hard'}.get(self.complexity, 'Unknown')
+
+class TimetableSession(db.Model):
+    __table_args__ = (
+        # Timetable pages list a user's sessions ordered by day and start time
+        db.Index('ix_timetable_session_user_date_start', 'user_id', 'date', 'start_time'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    duration = db.Column(db.Integer, nullable=False)
+    is_completed = db.Column(db.Boolean, default=False)
+    subject = db.relationship('Subject')
+
+class StudySession(db.Model):
+    __table_args__ = (
+        # Active-session lookups and the recent-sessions list on /progress
+        db.Index('ix_study_session_user_completed_end', 'user_id', 'is_completed', 'end_time'),
+        # Whether a slot has any study session (re-planning and archiving)
+        db.Index('ix_study_session_timetable_session', 'timetable_session_id'),
+        # A timetable slot can have at most one open study session
+        db.Index(
+            'uq_study_session_open_slot', 'timetable_session_id', unique=True,
+            sqlite_where=db.text('is_completed = 0'),
+            postgresql_where=db.text('NOT is_completed'),
+        ),
+        # Client-supplied Idempotency-Key of the start/complete request, unique per user
+        db.UniqueConstraint('user_id', 'start_key', name='uq_study_session_user_start_key'),
+        db.UniqueConstraint('user_id', 'complete_key', name='uq_study_session_user_complete_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
+    timetable_session_id = db.Column(db.Integer, db.ForeignKey('timetable_session.id'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=True)
+    duration_minutes = db.Column(db.Integer, nullable=True)
+    units_completed = db.Column(db.Integer, default=0)
+    is_completed = db.Column(db.Boolean, default=False)
+    start_key = db.Column(db.String(64), nullable=True)
+    complete_key = db.Column(db.String(64), nullable=True)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    subject = db.relationship('Subject')
+    timetable_session = db.relationship('TimetableSession')
+
+    __mapper_args__ = {'version_id_col': version}
+
+class CalendarBlock(db.Model):
+    # A time range the user can study in ('available') or cannot ('busy'),
+    # either every week on `weekday` (0 = Monday) or on one `date`
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    kind = db.Column(db.String(10), nullable=False)
+    weekday = db.Column(db.Integer, nullable=True)
+    date = db.Column(db.Date, nullable=True)
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+
+    @property
+    def day_label(self):
+        if self.date is not None:
+            return self.date.strftime('%a %d %b %Y')
+        return 'Every ' + ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')[self.weekday]
+
+class StudyDailyRollup(db.Model):
+    # Completed study per user, day and subject, kept up to date by
+    # complete_session so history views never scan StudySession
+    __tablename__ = 'study_daily_rollup'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), primary_key=True)
+    minutes = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    sessions = db.Column(db.Integer, nullable=False, default=0)
+
+class TimetableArchive(db.Model):
+    # Archived TimetableSessions of one user and month (first day of the
+    # month), as zlib-compressed JSON rows; see archive.py
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'month', name='uq_timetable_archive_user_month'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False)
+    sessions = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    payload = db.Column(db.LargeBinary, nullable=False)
+
+class StudySessionArchive(db.Model):
+    # Archived completed StudySessions of one user, subject and month of
+    # their end time, with totals kept beside the compressed rows
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'subject_id', 'month', name='uq_study_session_archive_user_subject_month'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False)
+    sessions = db.Column(db.Integer, nullable=False, default=0)
+    minutes = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    payload = db.Column(db.LargeBinary, nullable=False)
+
+class GenerationJob(db.Model):
+    __table_args__ = (
+        # Finding a user's queued/running job to coalesce duplicate requests
+        db.Index('ix_generation_job_user_status', 'user_id', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(30), nullable=False, default='timetable')
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    message = db.Column(db.String(200), nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def is_active(self):
+        return self.status in ('queued', 'running')
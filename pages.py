@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+from flask import Blueprint, render_template, request, jsonify
+from flask_login import login_required, current_user
+
+import archive
+import queries
+import rendering
+import rollup
+import stats
+
+bp = Blueprint('pages', __name__)
+
+MAX_HISTORY_DAYS = 366
+
+
+@bp.route('/')
+def home():
+    return render_template('home.html')
+
+@bp.route('/dashboard')
+@login_required
+def dashboard():
+    overall_progress = stats.progress_snapshot(current_user.id)['overview']['overall_progress']
+    return render_template('dashboard.html', username=current_user.username, overall_progress=overall_progress)
+
+@bp.route('/progress')
+@login_required
+def progress():
+    # Aggregates are computed in SQL and cached per user until progress changes
+    snapshot = stats.progress_snapshot(current_user.id)
+    
+    # Get recent study sessions for display
+    recent_sessions = queries.recent_sessions(current_user.id, 10)
+
+    def render():
+        return render_template(
+            "progress.html",
+            subjects=snapshot['subjects'],
+            daily_minutes=snapshot['daily_minutes'],
+            recent_sessions=recent_sessions,
+            **snapshot['overview']
+        )
+
+    version = (snapshot, [(s.id, s.subject.name, s.end_time, s.duration_minutes, s.units_completed)
+                          for s in recent_sessions])
+    return rendering.conditional_page(current_user, version, render)
+
+@bp.route('/api/progress/heatmap')
+@login_required
+def api_heatmap():
+    """Minutes studied on each day of ?year= (default: this year), from the daily rollup."""
+    year = request.args.get('year', datetime.now().year, type=int)
+    if not 1 <= year <= 9999:
+        return jsonify({'success': False, 'message': 'Invalid year'}), 400
+    days = rollup.heatmap(current_user.id, year)
+    return jsonify({
+        'year': year,
+        'days': [{'date': day.isoformat(), 'minutes': minutes, 'sessions': sessions}
+                 for day, minutes, sessions in days],
+        'total_minutes': sum(minutes for _, minutes, _ in days),
+    })
+
+@bp.route('/api/progress/streak')
+@login_required
+def api_streak():
+    today = datetime.now().date()
+    streak, last_day = rollup.current_streak(current_user.id, today)
+    return jsonify({
+        'current_streak': streak,
+        'last_study_day': last_day.isoformat() if last_day else None,
+        'studied_today': last_day == today,
+    })
+
+@bp.route('/api/progress/history')
+@login_required
+def api_history():
+    """Completed study sessions between ?from= and ?to= (default: the last 30 days), archived ones included."""
+    today = datetime.now().date()
+    try:
+        last_day = datetime.strptime(request.args['to'], '%Y-%m-%d').date() if 'to' in request.args else today
+        first_day = (datetime.strptime(request.args['from'], '%Y-%m-%d').date() if 'from' in request.args
+                     else last_day - timedelta(days=29))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be YYYY-MM-DD'}), 400
+    if not timedelta(0) <= last_day - first_day <= timedelta(days=MAX_HISTORY_DAYS):
+        return jsonify({'success': False, 'message': f'Choose a range of up to {MAX_HISTORY_DAYS} days'}), 400
+
+    names = {subject.id: subject.name for subject in queries.user_subjects(current_user.id)}
+    return jsonify({
+        'from': first_day.isoformat(),
+        'to': last_day.isoformat(),
+        'sessions': [{
+            'id': row.id,
+            'subject_id': row.subject_id,
+            'subject': names.get(row.subject_id),
+            'start_time': row.start_time.isoformat(),
+            'end_time': row.end_time.isoformat(),
+            'duration_minutes': row.duration_minutes,
+            'units_completed': row.units_completed,
+            'archived': row.archived,
+        } for row in archive.study_history(current_user.id, first_day, last_day)],
+    })
+
+@bp.route('/pomodoro')
+@login_required
+def pomodoro():
+    return render_template('pomodoro.html')
+
+@bp.route('/pomodoro/<subject_name>')
+@login_required
+def pomodoro_subject(subject_name):
+    return render_template('pomodoro.html', subject_name=subject_name)
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta, time
+
+from sqlalchemy import select, insert, delete, exists, or_
+
+from intervals import to_time
+from models import db, TimetableSession, StudySession
+
+# SQLite caps the number of bound parameters per statement
+DELETE_CHUNK_SIZE = 500
+
+
+def layout_day(user_id, date, daily_schedule, start_time=time(9, 0), break_minutes=0):
+    """Place a day's sessions back to back and return them as timetable rows."""
+    rows = []
+    current_time = start_time
+    for item in daily_schedule:
+        duration = item['duration']
+        end_time = (datetime.combine(date, current_time) + timedelta(minutes=duration)).time()
+        rows.append({
+            'user_id': user_id,
+            'subject_id': item['subject'].id,
+            'date': date,
+            'start_time': current_time,
+            'end_time': end_time,
+            'duration': duration,
+            'is_completed': False,
+        })
+        current_time = (datetime.combine(date, end_time) + timedelta(minutes=break_minutes)).time()
+    return rows
+
+
+def place_day(user_id, date, daily_schedule, index, break_minutes=0):
+    """
+    Place a day's sessions into the free time of `index` (see
+    intervals.day_index) and return them as timetable rows. Each session
+    takes the first free slot after the previous one and its break, and
+    is added to the index; sessions that fit nowhere are left out.
+    """
+    rows = []
+    cursor = 0
+    for item in daily_schedule:
+        duration = item['duration']
+        start = index.first_fit(duration, cursor)
+        if start is None:
+            continue
+        index.occupy(start, start + duration)
+        rows.append({
+            'user_id': user_id,
+            'subject_id': item['subject'].id,
+            'date': date,
+            'start_time': to_time(start),
+            'end_time': to_time(start + duration),
+            'duration': duration,
+            'is_completed': False,
+        })
+        cursor = start + duration + break_minutes
+    return rows
+
+
+def _row_key(row):
+    return (row['subject_id'], row['date'], row['start_time'], row['end_time'], row['duration'])
+
+
+def _chunks(values, size=DELETE_CHUNK_SIZE):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def insert_sessions(rows):
+    """Insert timetable rows with a single executemany. Returns the row count."""
+    if rows:
+        db.session.execute(insert(TimetableSession), rows)
+    return len(rows)
+
+
+def _pending():
+    """Conditions of a timetable row nobody has studied yet: not completed and without a study session."""
+    return (
+        or_(TimetableSession.is_completed.is_(False), TimetableSession.is_completed.is_(None)),
+        ~exists().where(StudySession.timetable_session_id == TimetableSession.id),
+    )
+
+
+def delete_sessions(session_ids, pending_only=False):
+    """
+    Delete timetable rows by id, in chunks. With pending_only, rows that
+    were completed or got a study session since the ids were read are left
+    alone; the check runs in the DELETE itself. Returns the rows deleted.
+    """
+    deleted = 0
+    for chunk in _chunks(list(session_ids)):
+        statement = delete(TimetableSession).where(TimetableSession.id.in_(chunk))
+        if pending_only:
+            statement = statement.where(*_pending())
+        deleted += db.session.execute(statement.execution_options(synchronize_session=False)).rowcount
+    return deleted
+
+
+def sync_timetable(user_id, rows, start_date, end_date=None):
+    """
+    Make the user's timetable from start_date on (to end_date, inclusive)
+    match the given rows, touching only what changed.
+
+    Only pending rows are candidates for replacement: past days, completed
+    sessions and slots that already have a study session are never
+    modified. Pending rows identical to a planned one (same subject, date,
+    times and duration) are kept; the rest are removed and the missing rows
+    bulk inserted. Nothing is committed; the caller owns the transaction.
+
+    Returns a dict with the number of rows inserted, deleted and kept.
+    """
+    wanted = {}
+    for row in rows:
+        wanted.setdefault(_row_key(row), []).append(row)
+
+    query = select(
+        TimetableSession.id,
+        TimetableSession.subject_id,
+        TimetableSession.date,
+        TimetableSession.start_time,
+        TimetableSession.end_time,
+        TimetableSession.duration,
+    ).where(
+        TimetableSession.user_id == user_id,
+        TimetableSession.date >= start_date,
+        *_pending(),
+    )
+    if end_date is not None:
+        query = query.where(TimetableSession.date <= end_date)
+    existing = db.session.execute(query).mappings()
+
+    stale_ids = []
+    kept = 0
+    for row in existing:
+        matches = wanted.get(_row_key(row))
+        if matches:
+            matches.pop()
+            kept += 1
+        else:
+            stale_ids.append(row['id'])
+
+    # A session may have been started on a stale row since it was read
+    # (a job plans outside the request that starts it); that row stays
+    deleted = delete_sessions(stale_ids, pending_only=True)
+    inserted = insert_sessions([row for matches in wanted.values() for row in matches])
+
+    return {'inserted': inserted, 'deleted': deleted, 'kept': kept}
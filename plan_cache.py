@@ -0,0 +1,114 @@
+import json
+import sqlite3
+import threading
+
+from cache import TTLCache
+
+
+class PlanCache:
+    """
+    Solved daily plans keyed by a canonical hash of the problem (see
+    scheduler.plan_key), so users with the same subject setup share one
+    solve. Values are whatever the scheduler stores (selected positions
+    and the bound); they never go stale, as the key covers every input.
+
+    Two tiers: a bounded in-process LRU, and optionally a SQLite file that
+    survives restarts and is shared by every process on the machine. The
+    file is best effort: errors (e.g. a locked database) count as misses.
+    """
+
+    def __init__(self, maxsize=4096, path=None):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.configure(maxsize, path)
+
+    def configure(self, maxsize, path):
+        self.maxsize = maxsize
+        self.path = path
+        # Size bound only; a plan is valid for as long as its key exists
+        self._memory = TTLCache(maxsize=maxsize, ttl=float('inf'))
+        self._local = threading.local()
+
+    def init_app(self, app):
+        self.configure(app.config['PLAN_CACHE_SIZE'], app.config['PLAN_CACHE_PATH'])
+
+    def _db(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=1)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS plan_cache (key TEXT PRIMARY KEY, plan TEXT NOT NULL)')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        plan = self._memory.get(key) if self.maxsize else None
+        if plan is not None:
+            self._count('hits')
+            return plan
+        if self.path:
+            try:
+                row = self._db().execute('SELECT plan FROM plan_cache WHERE key = ?', (key,)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is not None:
+                plan = json.loads(row[0])
+                if self.maxsize:
+                    self._memory.set(key, plan)
+                self._count('hits')
+                self._count('disk_hits')
+                return plan
+        self._count('misses')
+        return None
+
+    def set(self, key, plan):
+        if self.maxsize:
+            self._memory.set(key, plan)
+        if self.path:
+            try:
+                with self._db() as connection:
+                    connection.execute('INSERT OR IGNORE INTO plan_cache (key, plan) VALUES (?, ?)',
+                                       (key, json.dumps(plan)))
+            except sqlite3.Error:
+                pass
+
+    def clear(self):
+        self._memory.clear()
+        if self.path:
+            with self._db() as connection:
+                connection.execute('DELETE FROM plan_cache')
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def take_counts(self):
+        """Return and reset the counters (used to hand a worker's counts to its parent)."""
+        with self._lock:
+            counts = {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses}
+            self.hits = self.disk_hits = self.misses = 0
+        return counts
+
+    def add_counts(self, counts):
+        for name, amount in counts.items():
+            self._count(name, amount)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+plans = PlanCache()
+
+
+def configure(maxsize, path):
+    """Process pool initializer: give a worker the parent's cache settings."""
+    plans.configure(maxsize, path)
@@ -0,0 +1,143 @@
+from sqlalchemy import and_, false, or_
+from sqlalchemy.orm import joinedload
+
+from models import db, CalendarBlock, Subject, TimetableSession, StudySession
+
+
+def user_subjects(user_id):
+    """All subjects of a user."""
+    return Subject.query.filter_by(user_id=user_id).all()
+
+
+def timetable_for_user(user_id, date_range=None):
+    """
+    Timetable sessions of a user ordered by (date, start_time), with their
+    subject loaded in the same query. Sessions of deleted subjects (kept
+    only as history) are left out.
+
+    date_range is an optional (first_day, last_day) pair, both inclusive;
+    either end may be None to leave it open.
+    """
+    query = TimetableSession.query.options(
+        joinedload(TimetableSession.subject, innerjoin=True)
+    ).filter(TimetableSession.user_id == user_id)
+
+    if date_range:
+        first_day, last_day = date_range
+        if first_day is not None:
+            query = query.filter(TimetableSession.date >= first_day)
+        if last_day is not None:
+            query = query.filter(TimetableSession.date <= last_day)
+
+    return query.order_by(TimetableSession.date, TimetableSession.start_time).all()
+
+
+def recent_sessions(user_id, n=10):
+    """The user's n most recently completed study sessions, with their subject."""
+    return StudySession.query.options(
+        joinedload(StudySession.subject, innerjoin=True)
+    ).filter_by(
+        user_id=user_id,
+        is_completed=True
+    ).order_by(StudySession.end_time.desc()).limit(n).all()
+
+
+def active_session(user_id):
+    """The user's open study session with its subject and timetable slot, or None."""
+    return StudySession.query.options(
+        joinedload(StudySession.subject, innerjoin=True),
+        joinedload(StudySession.timetable_session),
+    ).filter_by(
+        user_id=user_id,
+        is_completed=False
+    ).first()
+
+
+def timetable_page(user_id, after=None, limit=100):
+    """
+    Keyset page of a user's timetable: up to `limit` sessions strictly after
+    the (date, start_time, id) cursor `after`, in (date, start_time, id)
+    order. The id tells apart sessions that start at the same time; with
+    an id of None the page starts after every session at that time.
+    """
+    query = TimetableSession.query.options(
+        joinedload(TimetableSession.subject, innerjoin=True)
+    ).filter(TimetableSession.user_id == user_id)
+
+    if after is not None:
+        after_date, after_time, after_id = after
+        same_time = and_(TimetableSession.date == after_date, TimetableSession.start_time == after_time)
+        query = query.filter(or_(
+            TimetableSession.date > after_date,
+            and_(TimetableSession.date == after_date, TimetableSession.start_time > after_time),
+            and_(same_time, TimetableSession.id > after_id) if after_id is not None else false(),
+        ))
+
+    return query.order_by(
+        TimetableSession.date, TimetableSession.start_time, TimetableSession.id
+    ).limit(limit).all()
+
+
+def pending_slots(user_id, first_day, last_day=None):
+    """(subject_id, duration) of the user's not yet completed sessions from first_day (to last_day, inclusive)."""
+    query = TimetableSession.query.with_entities(
+        TimetableSession.subject_id, TimetableSession.duration
+    ).filter(
+        TimetableSession.user_id == user_id,
+        TimetableSession.date >= first_day,
+        or_(TimetableSession.is_completed.is_(False), TimetableSession.is_completed.is_(None)),
+    )
+    if last_day is not None:
+        query = query.filter(TimetableSession.date <= last_day)
+    return query.all()
+
+
+def subject_slots(user_id, subject_ids, first_day):
+    """(subject_id, date, duration) of the not yet completed sessions of some of a user's subjects from first_day on."""
+    return TimetableSession.query.with_entities(
+        TimetableSession.subject_id, TimetableSession.date, TimetableSession.duration
+    ).filter(
+        TimetableSession.user_id == user_id,
+        TimetableSession.subject_id.in_(list(subject_ids)),
+        TimetableSession.date >= first_day,
+        or_(TimetableSession.is_completed.is_(False), TimetableSession.is_completed.is_(None)),
+    ).all()
+
+
+def calendar_blocks(user_id):
+    """The user's availability windows and busy blocks."""
+    return CalendarBlock.query.filter_by(user_id=user_id).order_by(
+        CalendarBlock.weekday, CalendarBlock.date, CalendarBlock.start_time
+    ).all()
+
+
+def taken_slots(user_id, first_day, last_day=None, pinned_only=False):
+    """
+    (date, start_time, end_time) of the user's timetable sessions from
+    first_day (to last_day, inclusive). pinned_only keeps the ones a
+    re-plan leaves in place: completed or with a study session.
+    """
+    query = TimetableSession.query.with_entities(
+        TimetableSession.date, TimetableSession.start_time, TimetableSession.end_time
+    ).filter(
+        TimetableSession.user_id == user_id,
+        TimetableSession.date >= first_day,
+    )
+    if last_day is not None:
+        query = query.filter(TimetableSession.date <= last_day)
+    if pinned_only:
+        query = query.filter(or_(
+            TimetableSession.is_completed.is_(True),
+            StudySession.query.filter(StudySession.timetable_session_id == TimetableSession.id).exists(),
+        ))
+    return query.all()
+
+
+def has_timetable_from(user_id, day):
+    """Whether the user has any timetable session on or after `day`."""
+    return db.session.query(
+        TimetableSession.query.filter(
+            TimetableSession.user_id == user_id,
+            TimetableSession.date >= day,
+        ).exists()
+    ).scalar()
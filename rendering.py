@@ -0,0 +1,136 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import current_app, make_response, render_template, request, session
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from werkzeug.http import is_resource_modified
+
+from cache import TTLCache
+
+
+def init_app(app):
+    """Cache compiled templates on disk so new workers skip compiling them."""
+    app.config.setdefault('JINJA_BYTECODE_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
+    directory = app.config['JINJA_BYTECODE_CACHE_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def version_hash(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+
+# ---------------------- Fragment cache ---------------------- #
+class FragmentCache:
+    """
+    Rendered HTML fragments keyed by an identity (e.g. user and day), each
+    stored with the version of the data it was rendered from. A lookup with
+    a different version re-renders, so a stale fragment is never served
+    even if an invalidation was missed (e.g. a write in another process).
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, version, render):
+        cached = self.backend.get(key)
+        if cached is not None and cached[0] == version:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        html = Markup(render())
+        self.backend.set(key, (version, html))
+        return html
+
+    def invalidate(self, key):
+        self.backend.delete(key)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+timetable_days = FragmentCache(TTLCache(maxsize=4096, ttl=3600))
+
+
+def day_version(sessions):
+    """Everything a day card shows, reduced to a comparable value."""
+    return version_hash(*(
+        (s.id, bool(s.is_completed), getattr(s, 'archived', False), s.start_time, s.end_time, s.duration,
+         s.subject_id, s.subject.name, s.subject.priority, s.subject.complexity)
+        for s in sessions
+    ))
+
+
+def render_day(user_id, day, sessions):
+    """A timetable day card, served from the fragment cache when unchanged."""
+    return timetable_days.get_or_render(
+        (user_id, day), day_version(sessions),
+        lambda: render_template('_timetable_day.html', day=day, sessions=sessions),
+    )
+
+
+def invalidate_day(user_id, day):
+    timetable_days.invalidate((user_id, day))
+
+
+# ---------------------- Conditional responses ---------------------- #
+_first_seen = TTLCache(maxsize=8192, ttl=24 * 3600)
+_first_seen_lock = threading.Lock()
+
+
+def _last_modified(etag):
+    # There is no modification time to read for a page, so use the moment
+    # this process first served this version of it (ETags still take
+    # precedence when the client sends both validators)
+    with _first_seen_lock:
+        seen = _first_seen.get(etag)
+        if seen is None:
+            seen = datetime.now(timezone.utc).replace(microsecond=0)
+            _first_seen.set(etag, seen)
+    return seen
+
+
+def page_etag(user, version):
+    """
+    ETag for a page showing `version` of the user's data. The pages embed a
+    CSRF token that expires, so the ETag also rolls over every half token
+    lifetime; a revalidated page is never served with an expired token.
+    """
+    token_life = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    window = int(time.time() // (token_life / 2)) if token_life else 0
+    return version_hash(user.id, user.username, window, version)
+
+
+def conditional_page(user, version, render):
+    """
+    Answer with 304 when the client already has this version of the page,
+    otherwise call render() and attach ETag/Last-Modified validators.
+    Pages with pending flash messages are always rendered.
+    """
+    if session.get('_flashes'):
+        return render()
+
+    etag = page_etag(user, version)
+    last_modified = _last_modified(etag)
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = make_response(render())
+    else:
+        response = current_app.response_class(status=304)
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Always revalidate; the page is per user
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
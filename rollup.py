@@ -0,0 +1,127 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+import archive
+from models import db, StudySession, StudySessionArchive, StudyDailyRollup
+
+# Backfill batches are ranges of users, so each batch rebuilds complete rows
+BACKFILL_BATCH_USERS = 500
+# Rows per multi-row upsert, well under SQLite's bound-parameter limit
+ADD_CHUNK_SIZE = 1000
+
+
+def _add(rows):
+    """Add rollup rows to the stored ones, creating those that do not exist yet."""
+    dialect = postgresql if db.session.get_bind().dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(StudyDailyRollup).values(rows)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['user_id', 'day', 'subject_id'],
+        set_={
+            'minutes': StudyDailyRollup.minutes + statement.excluded.minutes,
+            'units': StudyDailyRollup.units + statement.excluded.units,
+            'sessions': StudyDailyRollup.sessions + statement.excluded.sessions,
+        },
+    ))
+
+
+def record(user_id, day, subject_id, minutes, units):
+    """
+    Add one completed session to its (user, day, subject) rollup row, in the
+    caller's transaction. The row is created on the first completion of the
+    day and incremented in place after that.
+    """
+    _add([{'user_id': user_id, 'day': day, 'subject_id': subject_id,
+           'minutes': minutes, 'units': units, 'sessions': 1}])
+
+
+def backfill(batch_size=BACKFILL_BATCH_USERS):
+    """
+    Rebuild the rollup from completed StudySessions, live and archived, one
+    batch of users per transaction: their rollup rows are deleted and
+    re-aggregated with a single INSERT ... SELECT, then the archived days
+    are added, so every batch is one short write. Yields (users done, users
+    total, rows written) after each batch.
+    """
+    # Users with rollup rows but no completed sessions left are cleared too
+    user_ids = sorted(set(db.session.scalars(
+        select(StudySession.user_id).where(StudySession.is_completed.is_(True)).distinct()
+    )) | set(db.session.scalars(
+        select(StudySessionArchive.user_id).distinct()
+    )) | set(db.session.scalars(select(StudyDailyRollup.user_id).distinct())))
+    db.session.commit()
+
+    day = func.date(StudySession.end_time)
+    for offset in range(0, len(user_ids), batch_size):
+        first, last = user_ids[offset], user_ids[min(offset + batch_size, len(user_ids)) - 1]
+        db.session.execute(delete(StudyDailyRollup).where(StudyDailyRollup.user_id.between(first, last)))
+        aggregated = select(
+            StudySession.user_id, day, StudySession.subject_id,
+            func.sum(func.coalesce(StudySession.duration_minutes, 0)),
+            func.sum(func.coalesce(StudySession.units_completed, 0)),
+            func.count(),
+        ).where(
+            StudySession.user_id.between(first, last),
+            StudySession.is_completed.is_(True),
+            StudySession.end_time.is_not(None),
+        ).group_by(StudySession.user_id, day, StudySession.subject_id)
+        db.session.execute(
+            insert(StudyDailyRollup).from_select(
+                ['user_id', 'day', 'subject_id', 'minutes', 'units', 'sessions'], aggregated,
+            )
+        )
+        archived = archive.daily_study_totals(first, last)
+        for start in range(0, len(archived), ADD_CHUNK_SIZE):
+            _add(archived[start:start + ADD_CHUNK_SIZE])
+        rows = db.session.scalar(
+            select(func.count()).select_from(StudyDailyRollup).where(StudyDailyRollup.user_id.between(first, last))
+        )
+        db.session.commit()
+        yield min(offset + batch_size, len(user_ids)), len(user_ids), rows
+
+
+def heatmap(user_id, year):
+    """
+    Minutes and sessions on every day of `year` the user studied, as
+    [(date, minutes, sessions)] oldest first. Reads at most one row per
+    subject per day of the year, however many sessions there were.
+    """
+    rows = db.session.execute(
+        select(StudyDailyRollup.day, func.sum(StudyDailyRollup.minutes), func.sum(StudyDailyRollup.sessions))
+        .where(
+            StudyDailyRollup.user_id == user_id,
+            StudyDailyRollup.day.between(date(year, 1, 1), date(year, 12, 31)),
+        )
+        .group_by(StudyDailyRollup.day)
+        .order_by(StudyDailyRollup.day)
+    ).all()
+    return [(day, minutes, sessions) for day, minutes, sessions in rows]
+
+
+def current_streak(user_id, today=None):
+    """
+    Number of consecutive days up to today with a completed session, and
+    the last day with one (None if there is none). A streak that ended
+    yesterday is still current, as today can continue it. Only the
+    streak's own days are read.
+    """
+    today = today or datetime.now().date()
+    days = db.session.scalars(
+        select(StudyDailyRollup.day).distinct()
+        .where(StudyDailyRollup.user_id == user_id, StudyDailyRollup.day <= today)
+        .order_by(StudyDailyRollup.day.desc())
+        .execution_options(yield_per=64)
+    )
+    streak, last_day, expected = 0, None, None
+    for day in days:
+        if last_day is None:
+            last_day = day
+            if day < today - timedelta(days=1):
+                break
+        elif day != expected:
+            break
+        streak += 1
+        expected = day - timedelta(days=1)
+    days.close()
+    return streak, last_day
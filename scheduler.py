@@ -1,12 +1,49 @@
-def generate_knapsack_schedule(subjects, time_limit):
-    """
-    Fatigue-aware 0/1 Knapsack Scheduler:
-    Selects subject sessions to fit within a daily time limit.
-    Applies a fatigue penalty to reduce the value of later sessions.
-    """
-    sessions = []
-    fatigue_penalty = 0.1  
+import hashlib
+import time
+from collections import namedtuple
+from operator import gt, lt
+
+from plan_cache import plans
+
+FATIGUE_PENALTY = 0.1
+
+# Approximation bound of the FPTAS mode: its plans are worth at least
+# (1 - epsilon) times the optimum
+FPTAS_EPSILON = 0.1
+# Rough cost of one DP cell in the list-based solvers below, used to
+# predict solve time when a latency budget is given
+SECONDS_PER_CELL = 2e-7
+# Part of every plan cache key; bump it when a change to the solvers
+# should invalidate plans stored on disk
+PLAN_KEY_VERSION = 1
+
+# Units credited per session, relative to one unit per 30 minutes
+COMPLEXITY_FACTOR = {1: 1.5, 2: 1.25, 3: 1.0, 4: 0.75, 5: 0.5}
+
+
+# Plain, picklable stand-in for a Subject row, used when planning runs in a
+# worker process
+SubjectSpec = namedtuple(
+    'SubjectSpec', 'id days_left total_units completed_units priority complexity'
+)
 
+
+def subject_spec(subject):
+    return SubjectSpec(
+        subject.id, subject.days_left, subject.total_units,
+        subject.completed_units or 0, subject.priority, subject.complexity,
+    )
+
+
+def units_for_session(duration_minutes, complexity):
+    """Units a session of this length is worth for a subject of this complexity."""
+    base_units = duration_minutes / 30
+    return max(1, int(base_units * COMPLEXITY_FACTOR.get(complexity, 1.0)))
+
+
+def build_sessions(subjects):
+    """Turn subjects into candidate sessions with a duration and a value."""
+    sessions = []
     for subject in subjects:
         base_duration = 30 + (subject.complexity * 10)  # base duration varies with complexity
         base_value = (6 - subject.priority)  # inverse priority → higher priority = more value
@@ -15,32 +52,390 @@ def generate_knapsack_schedule(subjects, time_limit):
             'duration': base_duration,
             'priority': base_value
         })
+    return sessions
+
+
+def _max_useful_sessions(sessions, time_limit, fatigue_penalty):
+    """Upper bound on how many sessions an optimal day can contain."""
+    # Shortest sessions first: nothing longer can squeeze more into the day
+    fit = 0
+    used = 0
+    for duration in sorted(s['duration'] for s in sessions):
+        if used + duration > time_limit:
+            break
+        used += duration
+        fit += 1
+
+    # Past this rank the fatigue factor is <= 0, so a session adds nothing
+    if fatigue_penalty > 0:
+        positive = 0
+        while positive < fit and 1 - fatigue_penalty * positive > 0:
+            positive += 1
+        return positive
+    return fit
+
+
+def generate_knapsack_schedule(subjects, time_limit):
+    """
+    Fatigue-aware 0/1 Knapsack Scheduler:
+    Selects subject sessions to fit within a daily time limit.
+    Applies a fatigue penalty to reduce the value of later sessions.
+
+    The k-th session taken (counting from 0) is worth
+    priority * (1 - penalty * k), so the DP state is (sessions taken, minutes
+    used). Values are kept in one rolling row per session count and every
+    take/skip decision is stored in a flat bytearray, which is walked
+    backwards to rebuild the selection.
+    """
+    sessions = build_sessions(subjects)
+    if not sessions or time_limit <= 0:
+        return []
+
+    max_count = _max_useful_sessions(sessions, time_limit, FATIGUE_PENALTY)
+    if max_count == 0:
+        return []
+    return _exact_schedule(sessions, time_limit, max_count)[0]
+
+
+# ---------------------- Solver strategies ---------------------- #
+# Each strategy takes (sessions, time_limit, max_count, epsilon) and returns
+# (schedule, bound): the chosen sessions, last-taken first like
+# generate_knapsack_schedule, and an upper bound on the best possible value.
+# Sessions count towards fatigue in the order of the input list.
+
+def schedule_value(schedule):
+    """Fatigue-adjusted value of a schedule returned by a strategy."""
+    return sum(
+        session['priority'] * (1 - FATIGUE_PENALTY * k)
+        for k, session in enumerate(reversed(schedule))
+    )
+
+
+def _upper_bound(sessions, time_limit, max_count):
+    """
+    The lower of two relaxations: a fractional knapsack without fatigue,
+    and the max_count best values each paired with the best fatigue
+    factor still free.
+    """
+    fitting = [s for s in sessions if s['duration'] <= time_limit]
+    fractional = 0.0
+    left = time_limit
+    for session in sorted(fitting, key=lambda s: s['priority'] / s['duration'], reverse=True):
+        if session['duration'] <= left:
+            fractional += session['priority']
+            left -= session['duration']
+        else:
+            fractional += session['priority'] * left / session['duration']
+            break
+
+    best_values = sorted((s['priority'] for s in fitting), reverse=True)[:max_count]
+    ranked = sum(value * (1 - FATIGUE_PENALTY * k) for k, value in enumerate(best_values))
+    return min(fractional, ranked)
+
+
+def _exact_columns(sessions, time_limit, max_count):
+    """
+    The columns of each row the exact DP fills: (lows, highs), where row k
+    (exactly k sessions) spans lows[k]..highs[k]. k sessions need at least
+    k times the shortest one, so columns below lows[k] stay unreachable, and
+    use at most the k longest ones' minutes, so columns past highs[k] only
+    repeat highs[k].
+    """
+    shortest = min((s['duration'] for s in sessions), default=0)
+    longest = sorted((s['duration'] for s in sessions), reverse=True)
+    highs = [min(time_limit, sum(longest[:k])) for k in range(max_count + 1)]
+    lows = [min(k * shortest, high) for k, high in enumerate(highs)]
+    return lows, highs
+
+
+def _exact_schedule(sessions, time_limit, max_count, epsilon=None):
+    n = len(sessions)
+    lows, highs = _exact_columns(sessions, time_limit, max_count)
+    width = highs[-1] + 1
+    unreachable = float('-inf')
+    # dp[k][t]: best value with exactly k sessions taken in at most t minutes;
+    # only lows[k]..highs[k] is kept up to date, see _exact_columns
+    dp = [[0.0] * width] + [[unreachable] * width for _ in range(max_count)]
+    # choices[(i * max_count + k) * width + t] == 1 → session i was taken as number k
+    choices = bytearray(n * max_count * width)
+
+    for i, current in enumerate(sessions):
+        duration = current['duration']
+        if duration > time_limit:
+            continue
+
+        # Walk k downwards so each session is used at most once
+        for k in range(min(i, max_count - 1), -1, -1):
+            first = lows[k] + duration
+            end = highs[k + 1] + 1
+            if first >= end:
+                continue
+            gain = current['priority'] * (1 - FATIGUE_PENALTY * k)
+            source = dp[k][lows[k]:min(end - duration, highs[k] + 1)]
+            # Row k holds the same value at every column past highs[k]
+            source += [dp[k][highs[k]]] * (end - duration - highs[k] - 1)
+            take = [value + gain for value in source]
+            row = dp[k + 1]
+            skip = row[first:end]
+
+            taken = bytes(map(gt, take, skip))
+            if 1 not in taken:
+                continue
+
+            row[first:end] = map(max, skip, take)
+            offset = (i * max_count + k) * width + first
+            choices[offset:offset + end - first] = taken
 
+    best_row = max(range(len(dp)), key=lambda count: dp[count][highs[count]])
+
+    best_schedule = []
+    t = time_limit
+    k = best_row
+    for i in range(n - 1, -1, -1):
+        if k == 0:
+            break
+        t = min(t, highs[k])
+        if choices[(i * max_count + k - 1) * width + t]:
+            best_schedule.append(sessions[i])
+            t -= sessions[i]['duration']
+            k -= 1
+
+    # Backtracking yields the last-taken session first, matching the previous ordering
+    return best_schedule, schedule_value(best_schedule)
+
+
+def _greedy_schedule(sessions, time_limit, max_count, epsilon=None):
+    """Highest priority per minute first, while sessions still fit."""
+    order = sorted(
+        range(len(sessions)),
+        key=lambda i: sessions[i]['priority'] / sessions[i]['duration'], reverse=True,
+    )
+    taken = []
+    left = time_limit
+    for i in order:
+        if len(taken) == max_count:
+            break
+        if sessions[i]['duration'] <= left:
+            taken.append(i)
+            left -= sessions[i]['duration']
+    schedule = [sessions[i] for i in sorted(taken, reverse=True)]
+    return schedule, _upper_bound(sessions, time_limit, max_count)
+
+
+def _fptas_scale(sessions, time_limit, max_count, epsilon):
+    """
+    Value unit and DP row width of the FPTAS. Rounding gains down to whole
+    units loses less than one unit per session taken, and any single
+    session that fits is a valid plan, so a unit of epsilon * best /
+    max_count keeps the loss within epsilon * OPT.
+    """
+    best = max((s['priority'] for s in sessions if s['duration'] <= time_limit), default=0)
+    if best <= 0:
+        return 0, 0
+    unit = epsilon * best / max_count
+    # No plan is worth more than the best value at every fatigue level
+    width = sum(int(best * (1 - FATIGUE_PENALTY * k) / unit) for k in range(max_count)) + 1
+    return unit, width
+
+
+def _fptas_schedule(sessions, time_limit, max_count, epsilon=FPTAS_EPSILON):
+    """
+    Value-scaling FPTAS. Gains are rounded down to multiples of a unit
+    derived from epsilon, and the DP finds the fewest minutes needed for
+    each (sessions taken, scaled value). Its cost depends on n, max_count
+    and 1/epsilon but not on time_limit.
+    """
+    n = len(sessions)
+    unit, width = _fptas_scale(sessions, time_limit, max_count, epsilon)
+    if not width:
+        return [], 0.0
+
+    def scaled(i, k):
+        return int(sessions[i]['priority'] * (1 - FATIGUE_PENALTY * k) / unit)
+
+    unreachable = float('inf')
+    # dp[k][v]: fewest minutes for exactly k sessions worth v units
+    dp = [[0] + [unreachable] * (width - 1)] + [[unreachable] * width for _ in range(max_count)]
+    choices = bytearray(n * max_count * width)
+
+    for i, current in enumerate(sessions):
+        duration = current['duration']
+        if duration > time_limit:
+            continue
+        for k in range(min(i, max_count - 1), -1, -1):
+            gain = scaled(i, k)
+            if gain == 0:
+                continue
+            span = width - gain
+            take = [minutes + duration for minutes in dp[k][:span]]
+            row = dp[k + 1]
+            skip = row[gain:]
+
+            better = bytes(map(lt, take, skip))
+            if 1 not in better:
+                continue
+
+            row[gain:] = map(min, skip, take)
+            offset = (i * max_count + k) * width + gain
+            choices[offset:offset + span] = better
+
+    k, v = max(
+        ((k, v) for k in range(max_count + 1) for v in range(width) if dp[k][v] <= time_limit),
+        key=lambda state: state[1],
+    )
+    schedule = []
+    for i in range(n - 1, -1, -1):
+        if k == 0:
+            break
+        if choices[(i * max_count + k - 1) * width + v]:
+            schedule.append(sessions[i])
+            v -= scaled(i, k - 1)
+            k -= 1
+
+    # Each session taken lost less than one unit to rounding
+    bound = min(schedule_value(schedule) + max_count * unit,
+                _upper_bound(sessions, time_limit, max_count))
+    return schedule, bound
+
+
+STRATEGIES = {
+    'greedy': _greedy_schedule,
+    'fptas': _fptas_schedule,
+    'exact': _exact_schedule,
+}
+
+Solution = namedtuple('Solution', 'sessions value bound gap mode seconds')
+
+
+def estimate_cells(mode, sessions, time_limit, max_count, epsilon=FPTAS_EPSILON):
+    """DP cells a strategy would fill for this problem (its predicted cost)."""
     n = len(sessions)
-    dp = [[0] * (time_limit + 1) for _ in range(n + 1)]
-    selected_map = [[[] for _ in range(time_limit + 1)] for _ in range(n + 1)]
-
-    for i in range(1, n + 1):
-        for t in range(time_limit + 1):
-            current = sessions[i - 1]
-            duration = current['duration']
-
-            if duration <= t:
-                fatigue_level = len(selected_map[i - 1][t - duration])
-                adjusted_value = current['priority'] * (1 - fatigue_penalty * fatigue_level)
-
-                take = adjusted_value + dp[i - 1][t - duration]
-                skip = dp[i - 1][t]
-
-                if take > skip:
-                    dp[i][t] = take
-                    selected_map[i][t] = selected_map[i - 1][t - duration] + [current]
-                else:
-                    dp[i][t] = skip
-                    selected_map[i][t] = selected_map[i - 1][t]
-            else:
-                dp[i][t] = dp[i - 1][t]
-                selected_map[i][t] = selected_map[i - 1][t]
-
-    best_schedule = selected_map[n][time_limit]
-    return best_schedule[::-1]  # return in original order
+    if mode == 'exact':
+        lows, highs = _exact_columns(sessions, time_limit, max_count)
+        return n * sum(highs[k + 1] - lows[k + 1] + 1 for k in range(max_count))
+    if mode == 'fptas':
+        return n * max_count * _fptas_scale(sessions, time_limit, max_count, epsilon)[1]
+    return n
+
+
+def choose_mode(sessions, time_limit, max_count, budget=None, epsilon=FPTAS_EPSILON):
+    """
+    The most exact strategy predicted to finish within `budget` seconds
+    (no budget: exact). The FPTAS is only picked when it is also cheaper
+    than the exact DP, which it is for long days and large n.
+    """
+    if budget is None:
+        return 'exact'
+    exact_cells = estimate_cells('exact', sessions, time_limit, max_count)
+    if exact_cells * SECONDS_PER_CELL <= budget:
+        return 'exact'
+    fptas_cells = estimate_cells('fptas', sessions, time_limit, max_count, epsilon)
+    if fptas_cells < exact_cells and fptas_cells * SECONDS_PER_CELL <= budget:
+        return 'fptas'
+    return 'greedy'
+
+
+def plan_key(sessions, time_limit, mode, epsilon):
+    """
+    Cache key of a daily problem: the multiset of (duration, value) pairs,
+    the capacity and the solver settings. Which subjects the sessions
+    belong to does not matter, so users with the same setup share a plan.
+    """
+    items = sorted((s['duration'], s['priority']) for s in sessions)
+    settings = (PLAN_KEY_VERSION, FATIGUE_PENALTY, mode, epsilon if mode == 'fptas' else None)
+    return hashlib.sha1(repr((settings, time_limit, items)).encode()).hexdigest()
+
+
+def solve_schedule(subjects, time_limit, mode='auto', budget=None, epsilon=FPTAS_EPSILON):
+    """
+    Plans one day with the given strategy ('exact', 'fptas', 'greedy', or
+    'auto' to pick one with choose_mode). Returns a Solution with the
+    schedule, its value, an upper bound on the optimum and the relative
+    optimality gap (bound - value) / bound.
+
+    Sessions are solved in a canonical order (highest value first, then
+    shortest), so the plan depends only on plan_key and is shared through
+    plan_cache.plans: the cache stores the selected positions, which are
+    mapped back onto these subjects.
+    """
+    started = time.perf_counter()
+    sessions = sorted(build_sessions(subjects), key=lambda s: (-s['priority'], s['duration']))
+    max_count = _max_useful_sessions(sessions, time_limit, FATIGUE_PENALTY) if time_limit > 0 else 0
+    if mode == 'auto':
+        mode = choose_mode(sessions, time_limit, max_count, budget, epsilon)
+    if max_count == 0:
+        return Solution([], 0.0, 0.0, 0.0, mode, time.perf_counter() - started)
+
+    key = plan_key(sessions, time_limit, mode, epsilon)
+    cached = plans.get(key)
+    if cached is not None:
+        positions, bound = cached
+        schedule = [sessions[position] for position in positions]
+    else:
+        schedule, bound = STRATEGIES[mode](sessions, time_limit, max_count, epsilon)
+        position = {id(session): index for index, session in enumerate(sessions)}
+        plans.set(key, ([position[id(session)] for session in schedule], bound))
+
+    value = schedule_value(schedule)
+    bound = max(bound, value)
+    gap = (bound - value) / bound if bound else 0.0
+    return Solution(schedule, value, bound, gap, mode, time.perf_counter() - started)
+
+
+def plan_horizon(subjects, days, minutes_per_day, first_day=0, mode='auto', budget=None,
+                 epsilon=FPTAS_EPSILON):
+    """
+    Plans every day of a multi-day horizon in one pass.
+
+    A subject is only scheduled before its deadline (days_left) and while it
+    still has units left (total_units - completed_units). Each planned session
+    uses up the units it is expected to cover, so subjects drop out once they
+    are done. Days with the same set of open subjects share one knapsack
+    solve, so the number of solves grows with the number of deadline and
+    completion events rather than with the length of the horizon.
+
+    first_day skips the days before it (deadlines are still counted from
+    day 0), for re-planning the tail of an existing horizon. mode, budget
+    and epsilon are passed to solve_schedule for every solve.
+
+    minutes_per_day is either one number for every day or a sequence with
+    one entry per planned day (from first_day on), e.g. each day's free time.
+
+    Returns a list with one daily schedule per day from first_day on.
+    """
+    remaining = [
+        max(0, subject.total_units - (subject.completed_units or 0))
+        for subject in subjects
+    ]
+    solved = {}
+    plan = []
+
+    for day in range(first_day, days):
+        if isinstance(minutes_per_day, int):
+            capacity = minutes_per_day
+        else:
+            capacity = minutes_per_day[day - first_day]
+        open_subjects = tuple(
+            index for index, subject in enumerate(subjects)
+            if subject.days_left > day and remaining[index] > 0
+        )
+        problem = (open_subjects, capacity)
+        if problem not in solved:
+            daily = solve_schedule(
+                [subjects[index] for index in open_subjects], capacity,
+                mode, budget, epsilon,
+            ).sessions
+            positions = {id(subjects[index]): index for index in open_subjects}
+            solved[problem] = [
+                (positions[id(session['subject'])], session) for session in daily
+            ]
+
+        daily_schedule = []
+        for index, session in solved[problem]:
+            daily_schedule.append(session)
+            remaining[index] -= units_for_session(
+                session['duration'], session['subject'].complexity
+            )
+        plan.append(daily_schedule)
+
+    return plan
@@ -0,0 +1,278 @@
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, jsonify, request
+from flask_login import login_required, current_user
+from sqlalchemy import case, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+import events
+import queries
+import rendering
+import rollup
+import stats
+from jobs import runner
+from models import db, Subject, TimetableSession, StudySession
+from sqlite_profile import retry_on_locked
+
+bp = Blueprint('sessions', __name__)
+
+
+MAX_IDEMPOTENCY_KEY = 64
+
+
+def _idempotency_key():
+    """The request's Idempotency-Key header, if it is usable."""
+    key = request.headers.get('Idempotency-Key', '').strip()
+    return key if 0 < len(key) <= MAX_IDEMPOTENCY_KEY else None
+
+
+def _started(study_session):
+    return jsonify({
+        'success': True, 
+        'session_id': study_session.id,
+        'message': 'Study session started!'
+    })
+
+
+def _completion(units_completed, completed_units, total_units):
+    total_progress = round((completed_units / total_units) * 100, 1) if total_units > 0 else 0.0
+    return {
+        'success': True,
+        'units_completed': units_completed,
+        'total_progress': total_progress,
+        'message': f'Great job! You completed {units_completed} units.'
+    }
+
+
+@retry_on_locked
+def _open_session(timetable_session_id, **fields):
+    """Insert a study session of the slot; None if a re-plan deleted the slot meanwhile."""
+    study_session = StudySession(timetable_session_id=timetable_session_id, **fields)
+    db.session.add(study_session)
+    db.session.flush()
+    # The insert holds the write lock, so a re-plan deleting this slot
+    # either committed already (the slot is gone) or will see the session
+    if not db.session.query(TimetableSession.query.filter_by(id=timetable_session_id).exists()).scalar():
+        db.session.rollback()
+        return None
+    db.session.commit()
+    return study_session
+
+
+@bp.route('/start_session/<int:timetable_session_id>', methods=['POST'])
+@login_required
+def start_session(timetable_session_id):
+    key = _idempotency_key()
+    if key:
+        # A retry of a start that already went through
+        replay = StudySession.query.filter_by(user_id=current_user.id, start_key=key).first()
+        if replay:
+            return _started(replay)
+
+    timetable_session = TimetableSession.query.options(
+        joinedload(TimetableSession.subject)
+    ).get_or_404(timetable_session_id)
+    
+    if timetable_session.user_id != current_user.id:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    
+    # Captured before commit expires the loaded attributes
+    start_time = datetime.now()
+    started = {
+        'subject_name': timetable_session.subject.name,
+        'start_time': start_time.isoformat(),
+        'planned_duration': timetable_session.duration,
+    }
+
+    # Create new study session; the unique index on open slots rejects a
+    # second one, so there is no separate "already started?" query to race.
+    # Only the insert is retried on a lock error.
+    try:
+        study_session = _open_session(
+            timetable_session_id,
+            user_id=current_user.id,
+            subject_id=timetable_session.subject_id,
+            start_time=start_time,
+            start_key=key,
+        )
+    except IntegrityError:
+        db.session.rollback()
+        if key:
+            # A concurrent retry with the same key got there first
+            replay = StudySession.query.filter_by(user_id=current_user.id, start_key=key).first()
+            if replay:
+                return _started(replay)
+        # Another request opened this slot first (uq_study_session_open_slot)
+        return jsonify({'success': False, 'message': 'Session already in progress'}), 400
+    if study_session is None:
+        return jsonify({'success': False, 'message': 'This session was just re-planned. Please reload.'}), 409
+
+    events.hub.publish(current_user.id, 'start', dict(started, session_id=study_session.id))
+    
+    return _started(study_session)
+
+@retry_on_locked
+def _claim_completion(study_session_id, version, subject_id, timetable_session_id, key,
+                      end_time, duration_minutes, units_completed):
+    """
+    Complete the study session and book its units in one transaction.
+    Returns the subject's (completed_units, total_units), or None if the
+    session was completed or changed since `version` was read.
+    """
+    # Only one request can move the session from open to completed, and
+    # only from the version read by the caller
+    claimed = db.session.execute(
+        update(StudySession)
+        .where(
+            StudySession.id == study_session_id,
+            StudySession.version == version,
+            StudySession.is_completed.is_(False),
+        )
+        .values(
+            end_time=end_time,
+            duration_minutes=duration_minutes,
+            units_completed=units_completed,
+            is_completed=True,
+            complete_key=key,
+            version=StudySession.version + 1,
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return None
+
+    # Update subject progress in the database, capped at total_units
+    new_units = func.coalesce(Subject.completed_units, 0) + units_completed
+    progress = db.session.execute(
+        update(Subject)
+        .where(Subject.id == subject_id)
+        .values(
+            completed_units=case((new_units > Subject.total_units, Subject.total_units), else_=new_units),
+            version=Subject.version + 1,
+        )
+        .returning(Subject.completed_units, Subject.total_units)
+        .execution_options(synchronize_session=False)
+    ).one()
+
+    # Mark timetable session as completed
+    db.session.execute(
+        update(TimetableSession)
+        .where(TimetableSession.id == timetable_session_id)
+        .values(is_completed=True)
+        .execution_options(synchronize_session=False)
+    )
+
+    # Daily totals for history views, in the same transaction as the claim
+    rollup.record(current_user.id, end_time.date(), subject_id, duration_minutes, units_completed)
+    db.session.commit()
+    return tuple(progress)
+
+
+@bp.route('/complete_session/<int:study_session_id>', methods=['POST'])
+@login_required
+def complete_session(study_session_id):
+    key = _idempotency_key()
+    study_session = StudySession.query.options(
+        joinedload(StudySession.subject),
+        joinedload(StudySession.timetable_session),
+    ).get_or_404(study_session_id)
+    
+    if study_session.user_id != current_user.id:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    
+    if study_session.is_completed:
+        if key and study_session.complete_key == key:
+            # A retry of this very completion: answer as before, write nothing
+            subject = study_session.subject
+            return jsonify(_completion(study_session.units_completed, subject.completed_units, subject.total_units))
+        return jsonify({'success': False, 'message': 'Session already completed'}), 400
+    
+    subject = study_session.subject
+    timetable_session = study_session.timetable_session
+    end_time = datetime.now()
+    duration_minutes = int((end_time - study_session.start_time).total_seconds() / 60)
+    
+    # Calculate units completed based on duration and complexity
+    # Base formula: 1 unit per 30 minutes, adjusted by complexity
+    from scheduler import units_for_session
+    units_completed = units_for_session(duration_minutes, subject.complexity)
+    # The timetable assumed the planned session would earn its full units;
+    # future days only need re-planning when the progress differs from that
+    on_plan = units_completed == units_for_session(timetable_session.duration, subject.complexity)
+    
+    completed_day, subject_id = timetable_session.date, subject.id
+    # Claim the completion; only this transaction is retried on a lock error
+    try:
+        progress = _claim_completion(
+            study_session_id, study_session.version, subject_id, timetable_session.id, key,
+            end_time, duration_minutes, units_completed,
+        )
+    except IntegrityError:
+        # The user already completed another session with this key
+        # (uq_study_session_user_complete_key)
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Idempotency-Key was already used for another request'}), 422
+    if progress is None:
+        if key:
+            # A concurrent retry with the same key got there first
+            replay = StudySession.query.options(joinedload(StudySession.subject)).filter_by(
+                id=study_session_id, complete_key=key
+            ).first()
+            if replay:
+                subject = replay.subject
+                return jsonify(_completion(replay.units_completed, subject.completed_units, subject.total_units))
+        return jsonify({'success': False, 'message': 'Session already completed'}), 400
+    completed_units, total_units = progress
+
+    # The completion is committed: a failure from here on is logged, and
+    # neither retried nor reported to the client as a failed completion
+    try:
+        stats.invalidate_progress(current_user.id)
+        rendering.invalidate_day(current_user.id, completed_day)
+        if not on_plan:
+            runner.submit_reschedule(current_user.id, subject_id)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Follow-up of completing study session %s failed', study_session_id)
+    
+    result = _completion(units_completed, completed_units, total_units)
+    events.hub.publish(current_user.id, 'complete', {
+        'session_id': study_session_id,
+        'units_completed': units_completed,
+        'total_progress': result['total_progress'],
+    })
+    
+    return jsonify(result)
+
+@bp.route('/events/sessions')
+@login_required
+def session_events():
+    """Server-Sent Events stream of the user's study session (start/complete/elapsed)."""
+    # The only query happens here; the stream itself runs without the database
+    active_session = queries.active_session(current_user.id)
+    active = events.active_state(active_session) if active_session else None
+    return Response(
+        events.session_stream(current_user.id, active, max_seconds=current_app.config['SESSION_STREAM_SECONDS']),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@bp.route('/get_active_session')
+@login_required
+def get_active_session():
+    """Get currently active study session for the user"""
+    active_session = queries.active_session(current_user.id)
+    
+    if active_session:
+        elapsed_minutes = int((datetime.now() - active_session.start_time).total_seconds() / 60)
+        return jsonify({
+            'has_active_session': True,
+            'session_id': active_session.id,
+            'subject_name': active_session.subject.name,
+            'elapsed_minutes': elapsed_minutes,
+            'planned_duration': active_session.timetable_session.duration
+        })
+    
+    return jsonify({'has_active_session': False})
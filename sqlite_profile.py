@@ -0,0 +1,93 @@
+import functools
+import random
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import QueuePool
+
+from models import db
+
+# Applied to every new connection. WAL lets readers run alongside the single
+# writer; NORMAL sync is durable across app crashes in WAL mode.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,        # ms to wait for a lock before SQLITE_BUSY
+    'cache_size': -20000,        # negative = KiB, so ~20 MB page cache
+    'mmap_size': 268435456,      # 256 MB memory-mapped I/O
+    'temp_store': 'MEMORY',
+}
+
+
+def is_file_database(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def engine_options(uri, pool_size=10, max_overflow=20, pool_timeout=30, busy_timeout=5000):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for a file-backed SQLite database: a QueuePool
+    shared across threads and a driver-level lock timeout. Other databases
+    (and in-memory SQLite) keep SQLAlchemy's defaults.
+    """
+    if not is_file_database(uri):
+        return {}
+    return {
+        'poolclass': QueuePool,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+        'connect_args': {'timeout': busy_timeout / 1000, 'check_same_thread': False},
+    }
+
+
+def install_pragmas(engine, pragmas=None):
+    """Run the PRAGMAs on every new DBAPI connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+    if not is_file_database(engine.url):
+        # WAL and mmap only make sense for an on-disk database
+        pragmas.pop('journal_mode', None)
+        pragmas.pop('mmap_size', None)
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def _is_lock_error(exc):
+    message = str(getattr(exc, 'orig', exc)).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def retry_on_locked(func=None, retries=5, base_delay=0.05, max_delay=1.0):
+    """
+    Retry a write transaction when SQLite reports the database as locked or
+    busy (e.g. a read transaction that could not be upgraded to a write).
+    The session is rolled back and the call repeated with jittered
+    exponential backoff; after `retries` attempts the error is raised.
+    """
+    if func is None:
+        return functools.partial(retry_on_locked, retries=retries, base_delay=base_delay, max_delay=max_delay)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                if not _is_lock_error(exc) or attempt >= retries:
+                    raise
+                db.session.rollback()
+                delay = min(max_delay, base_delay * (2 ** attempt))
+                time.sleep(delay / 2 + random.uniform(0, delay / 2))
+                attempt += 1
+
+    return wrapper
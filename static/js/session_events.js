@@ -0,0 +1,15 @@
+// Study-session updates pushed by the server over /events/sessions.
+// handlers: { active, start, elapsed, complete } each receiving the event data.
+function subscribeSessionEvents(handlers) {
+    if (!window.EventSource) {
+        return null;
+    }
+    
+    const source = new EventSource('/events/sessions');
+    ['active', 'start', 'elapsed', 'complete'].forEach(name => {
+        if (handlers[name]) {
+            source.addEventListener(name, event => handlers[name](JSON.parse(event.data)));
+        }
+    });
+    return source;
+}
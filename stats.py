@@ -0,0 +1,212 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, select, func, case, true, union_all
+
+from cache import CachedLoader, TTLCache
+from models import db, Subject, TimetableSession, StudySession, TimetableArchive, StudySessionArchive
+
+
+def _progress_expr():
+    """Per-subject completion in percent, as a SQL expression."""
+    return case(
+        (Subject.total_units > 0,
+         func.coalesce(Subject.completed_units, 0) * 100.0 / Subject.total_units),
+        else_=0.0,
+    )
+
+
+def _totals(user_id, days=0):
+    """
+    One-row subquery of the figures overview() reports, plus the minutes
+    studied on each of the last `days` days as minutes_day_0 (today),
+    minutes_day_1 (yesterday) and so on.
+    """
+    subject_totals = select(
+        func.count(Subject.id).label('subjects_count'),
+        func.round(func.avg(_progress_expr()), 1).label('overall_progress'),
+        func.coalesce(func.sum(Subject.completed_units), 0).label('total_completed_units'),
+    ).where(Subject.user_id == user_id).subquery()
+
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    week_start = today - timedelta(days=today.weekday())
+
+    def minutes_between(start, end=None):
+        ended = StudySession.end_time >= start
+        if end is not None:
+            ended = and_(ended, StudySession.end_time < end)
+        return func.coalesce(func.sum(case((ended, StudySession.duration_minutes), else_=0)), 0)
+
+    session_totals = select(
+        func.count(StudySession.id).label('total_sessions'),
+        func.coalesce(func.sum(StudySession.duration_minutes), 0).label('total_minutes'),
+        minutes_between(today).label('minutes_today'),
+        minutes_between(week_start).label('minutes_this_week'),
+        *(
+            minutes_between(today - timedelta(days=i), today - timedelta(days=i - 1)).label(f'minutes_day_{i}')
+            for i in range(days)
+        ),
+    ).where(
+        StudySession.user_id == user_id,
+        StudySession.is_completed.is_(True),
+    ).subquery()
+
+    timetable_totals = select(
+        func.count(TimetableSession.id).label('planned_sessions'),
+        func.coalesce(func.sum(case((TimetableSession.is_completed.is_(True), 1), else_=0)), 0)
+            .label('completed_planned'),
+    ).where(TimetableSession.user_id == user_id).subquery()
+
+    archived_sessions = select(
+        func.coalesce(func.sum(StudySessionArchive.sessions), 0).label('archived_sessions'),
+        func.coalesce(func.sum(StudySessionArchive.minutes), 0).label('archived_minutes'),
+    ).where(StudySessionArchive.user_id == user_id).subquery()
+
+    archived_timetable = select(
+        func.coalesce(func.sum(TimetableArchive.sessions), 0).label('archived_planned'),
+        func.coalesce(func.sum(TimetableArchive.completed), 0).label('archived_completed'),
+    ).where(TimetableArchive.user_id == user_id).subquery()
+
+    # Each side is a single aggregate row, so joining them on TRUE yields one row
+    return select(subject_totals, session_totals, timetable_totals, archived_sessions, archived_timetable).select_from(
+        subject_totals.join(session_totals, true()).join(timetable_totals, true())
+        .join(archived_sessions, true()).join(archived_timetable, true())
+    ).subquery()
+
+
+def _overview(row):
+    total_minutes = row['total_minutes'] + row['archived_minutes']
+    planned = row['planned_sessions'] + row['archived_planned']
+    completed_planned = row['completed_planned'] + row['archived_completed']
+    return {
+        'subjects_count': row['subjects_count'],
+        'overall_progress': row['overall_progress'] or 0,
+        'total_completed_units': row['total_completed_units'],
+        'total_sessions': row['total_sessions'] + row['archived_sessions'],
+        'total_minutes': total_minutes,
+        'total_hours': round(total_minutes / 60, 1),
+        'minutes_today': row['minutes_today'],
+        'minutes_this_week': row['minutes_this_week'],
+        'planned_sessions': planned,
+        'completion_rate': round(completed_planned * 100.0 / planned, 1) if planned else 0,
+    }
+
+
+def overview(user_id):
+    """
+    Headline numbers for the progress page, computed in a single statement:
+    subject progress, study time (overall, today and this week) from
+    completed StudySessions and the completion rate of planned
+    TimetableSessions. Overall figures include archived sessions, which
+    are always older than this week.
+    """
+    return _overview(db.session.execute(select(_totals(user_id))).mappings().one())
+
+
+def _studied(user_id):
+    """Subquery of completed study sessions and minutes per subject, archived ones included."""
+    both = union_all(
+        select(
+            StudySession.subject_id,
+            func.count(StudySession.id).label('sessions'),
+            func.coalesce(func.sum(StudySession.duration_minutes), 0).label('minutes'),
+        ).where(
+            StudySession.user_id == user_id,
+            StudySession.is_completed.is_(True),
+        ).group_by(StudySession.subject_id),
+        select(
+            StudySessionArchive.subject_id,
+            func.sum(StudySessionArchive.sessions),
+            func.sum(StudySessionArchive.minutes),
+        ).where(StudySessionArchive.user_id == user_id).group_by(StudySessionArchive.subject_id),
+    ).subquery()
+    return select(
+        both.c.subject_id,
+        func.sum(both.c.sessions).label('sessions'),
+        func.sum(both.c.minutes).label('minutes'),
+    ).group_by(both.c.subject_id).subquery()
+
+
+def subject_stats(user_id):
+    """
+    The user's subjects, each with the number of completed study sessions and
+    minutes studied, archived ones included. Rows are (Subject, sessions,
+    minutes).
+    """
+    studied = _studied(user_id)
+    return db.session.execute(
+        select(
+            Subject,
+            func.coalesce(studied.c.sessions, 0),
+            func.coalesce(studied.c.minutes, 0),
+        ).outerjoin(studied, studied.c.subject_id == Subject.id)
+        .where(Subject.user_id == user_id)
+        .order_by(Subject.id)
+    ).all()
+
+
+# ---------------------- Progress snapshot cache ---------------------- #
+# Progress only changes when a session is completed or a subject is added or
+# removed, so pages read a per-user snapshot and those writes invalidate it.
+
+# Days of study minutes in the snapshot, today included
+SNAPSHOT_DAYS = 7
+
+def _subject_snapshot(subject, session_count, minutes_studied):
+    return {
+        'id': subject.id,
+        'name': subject.name,
+        'days_left': subject.days_left,
+        'total_units': subject.total_units,
+        'completed_units': subject.completed_units or 0,
+        'priority': subject.priority,
+        'complexity': subject.complexity,
+        'progress_percent': subject.progress_percent,
+        'priority_label': subject.priority_label,
+        'complexity_label': subject.complexity_label,
+        'session_count': session_count,
+        'minutes_studied': minutes_studied,
+    }
+
+
+def _load_snapshot(user_id):
+    # One statement: the one-row totals, with the user's subjects outer-joined
+    # onto it so a user without subjects still gets a row
+    totals = _totals(user_id, SNAPSHOT_DAYS)
+    studied = _studied(user_id)
+    rows = db.session.execute(
+        select(
+            totals, Subject,
+            func.coalesce(studied.c.sessions, 0).label('session_count'),
+            func.coalesce(studied.c.minutes, 0).label('minutes_studied'),
+        )
+        .select_from(totals)
+        .outerjoin(Subject, Subject.user_id == user_id)
+        .outerjoin(studied, studied.c.subject_id == Subject.id)
+        .order_by(Subject.id)
+    ).all()
+
+    first = rows[0]._mapping
+    today = datetime.now().date()
+    return {
+        'overview': _overview(first),
+        'subjects': [
+            _subject_snapshot(row.Subject, row.session_count, row.minutes_studied)
+            for row in rows if row.Subject is not None
+        ],
+        # Oldest first
+        'daily_minutes': [
+            (today - timedelta(days=i), first[f'minutes_day_{i}']) for i in range(SNAPSHOT_DAYS - 1, -1, -1)
+        ],
+    }
+
+
+progress_cache = CachedLoader(_load_snapshot, TTLCache(maxsize=1024, ttl=30))
+
+
+def progress_snapshot(user_id):
+    """Cached progress figures for a user, as plain dicts safe to share across requests."""
+    return progress_cache.get(user_id)
+
+
+def invalidate_progress(user_id):
+    progress_cache.invalidate(user_id)
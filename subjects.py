@@ -0,0 +1,79 @@
+from flask import Blueprint, render_template, redirect, url_for, request, flash
+from flask_login import login_required, current_user
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+
+import rendering
+import stats
+from jobs import runner
+from models import db, Subject
+from sqlite_profile import retry_on_locked
+
+bp = Blueprint('subjects', __name__)
+
+
+@bp.route('/subjects')
+@login_required
+def subjects():
+    user_subjects = stats.progress_snapshot(current_user.id)['subjects']
+    return rendering.conditional_page(
+        current_user, user_subjects, lambda: render_template('subjects.html', subjects=user_subjects)
+    )
+
+@retry_on_locked
+def _create_subject(**fields):
+    subject = Subject(**fields)
+    db.session.add(subject)
+    db.session.commit()
+    return subject
+
+@bp.route('/add_subject', methods=['GET', 'POST'])
+@login_required
+def add_subject():
+    if request.method == 'POST':
+        try:
+            new_subject = _create_subject(
+                user_id=current_user.id,
+                name=request.form.get('name'),
+                days_left=request.form.get('days_left'),
+                total_units=request.form.get('total_units'),
+                priority=request.form.get('priority'),
+                complexity=request.form.get('complexity')
+            )
+        except OperationalError:
+            # Still locked after the retries: a server error, not bad input
+            raise
+        except Exception:
+            db.session.rollback()
+            flash('Error adding subject. Please check your inputs.', 'danger')
+            return render_template('add_subject.html')
+        stats.invalidate_progress(current_user.id)
+        runner.submit_reschedule(current_user.id, new_subject.id)
+        flash('Subject added successfully!', 'success')
+        return redirect(url_for('subjects.subjects'))
+    return render_template('add_subject.html')
+
+@retry_on_locked
+def _delete_subject(subject):
+    db.session.delete(subject)
+    db.session.commit()
+
+@bp.route('/delete_subject/<int:subject_id>', methods=['POST'])
+@login_required
+def delete_subject(subject_id):
+    subject = Subject.query.get_or_404(subject_id)
+    if subject.user_id != current_user.id:
+        flash("Unauthorized action.", "danger")
+        return redirect(url_for('subjects.subjects'))
+    # Only the delete is retried on a lock error, not the re-plan below
+    try:
+        _delete_subject(subject)
+    except StaleDataError:
+        # Progress was recorded on the subject after it was loaded
+        db.session.rollback()
+        flash("The subject was just updated. Please try again.", "warning")
+        return redirect(url_for('subjects.subjects'))
+    stats.invalidate_progress(current_user.id)
+    runner.submit_reschedule(current_user.id, subject_id)
+    flash("Subject deleted successfully.", "success")
+    return redirect(url_for('subjects.subjects'))
@@ -0,0 +1,190 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import attrgetter
+
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
+from flask_login import login_required, current_user
+
+import archive
+import queries
+import rendering
+import stats
+from models import db
+from sqlite_profile import retry_on_locked
+
+bp = Blueprint('timetable', __name__)
+
+TIMETABLE_PAGE_SIZE = 100
+TIMETABLE_MAX_PAGE_SIZE = 500
+
+# An archived (or live) row from archive.timetable_history with its subject
+# attached, so templates and _session_json read it like a TimetableSession
+HistorySession = namedtuple('HistorySession', archive.TimetableRow._fields + ('subject',))
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except ValueError:
+        return None
+
+def _parse_cursor(value):
+    """
+    Parse a 'YYYY-MM-DDTHH:MM:SS.ID' timetable cursor into (date, time, id);
+    the '.ID' part is optional and parses to None.
+    """
+    moment, _, session_id = (value or '').partition('.')
+    try:
+        cursor = datetime.strptime(moment, '%Y-%m-%dT%H:%M:%S')
+    except ValueError:
+        return None
+    if session_id and not session_id.isdigit():
+        return None
+    return cursor.date(), cursor.time(), int(session_id) if session_id else None
+
+def _with_subjects(user_id, rows):
+    """HistorySessions for TimetableRows; rows of deleted subjects are left out, as in queries.timetable_for_user."""
+    subjects = {subject.id: subject for subject in queries.user_subjects(user_id)}
+    return [HistorySession(*row, subject=subjects[row.subject_id]) for row in rows if row.subject_id in subjects]
+
+def _with_archived(user_id, cursor, sessions, limit):
+    """Merge the archived sessions after the cursor into a page of live ones, keeping the first `limit`."""
+    subjects = {subject.id: subject for subject in queries.user_subjects(user_id)}
+    archived = archive.archived_timetable_page(user_id, cursor, limit, subjects.keys())
+    if not archived:
+        return sessions
+    merged = sessions + [HistorySession(*row, subject=subjects[row.subject_id]) for row in archived]
+    merged.sort(key=attrgetter('date', 'start_time', 'id'))
+    return merged[:limit]
+
+def _session_json(session):
+    return {
+        'id': session.id,
+        'date': session.date.isoformat(),
+        'date_label': session.date.strftime('%A, %d %B %Y'),
+        'start_time': session.start_time.strftime('%H:%M'),
+        'end_time': session.end_time.strftime('%H:%M'),
+        'duration': session.duration,
+        'is_completed': bool(session.is_completed),
+        'archived': getattr(session, 'archived', False),
+        'subject': {
+            'id': session.subject.id,
+            'name': session.subject.name,
+            'priority': session.subject.priority,
+            'complexity': session.subject.complexity,
+        },
+        'pomodoro_url': url_for('pages.pomodoro_subject', subject_name=session.subject.name),
+    }
+
+@bp.route('/timetable')
+@login_required
+def timetable():
+    # Render one window (the current week by default); later weeks load from /api/timetable
+    today = datetime.now().date()
+    window_start = _parse_date(request.args.get('from')) or today - timedelta(days=today.weekday())
+    window_end = _parse_date(request.args.get('to')) or window_start + timedelta(days=6)
+    if window_end < window_start:
+        window_end = window_start + timedelta(days=6)
+
+    if window_start < archive.live_from(today):
+        # Weeks this old may have been moved to the archive; read both
+        sessions = _with_subjects(
+            current_user.id, archive.timetable_history(current_user.id, window_start, window_end)
+        )
+    else:
+        sessions = queries.timetable_for_user(current_user.id, (window_start, window_end))
+    days = [(day, list(group)) for day, group in groupby(sessions, key=attrgetter('date'))]
+    job_id = request.args.get('job', type=int)
+
+    def render():
+        return render_template(
+            'timetable.html',
+            day_cards=[rendering.render_day(current_user.id, day, day_sessions) for day, day_sessions in days],
+            window_start=window_start,
+            window_end=window_end,
+            previous_start=window_start - timedelta(days=7),
+            next_cursor=f"{window_end.isoformat()}T23:59:59",
+            job_id=job_id,
+        )
+
+    version = (window_start, window_end, job_id, [rendering.day_version(day_sessions) for _, day_sessions in days])
+    return rendering.conditional_page(current_user, version, render)
+
+@bp.route('/api/timetable')
+@login_required
+def api_timetable():
+    """Keyset-paginated timetable: sessions strictly after the `after` cursor."""
+    after = request.args.get('after')
+    cursor = _parse_cursor(after) if after else None
+    if after and cursor is None:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+
+    limit = request.args.get('limit', TIMETABLE_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, TIMETABLE_MAX_PAGE_SIZE))
+    sessions = queries.timetable_page(current_user.id, cursor, limit)
+    if cursor is None or cursor[0] < archive.live_from(datetime.now().date()):
+        sessions = _with_archived(current_user.id, cursor, sessions, limit)
+
+    next_cursor = None
+    if len(sessions) == limit:
+        last = sessions[-1]
+        next_cursor = f"{last.date.isoformat()}T{last.start_time.strftime('%H:%M:%S')}.{last.id}"
+
+    return jsonify({
+        'sessions': [_session_json(session) for session in sessions],
+        'next': next_cursor,
+    })
+
+@bp.route('/generate_schedule', methods=['POST'])
+@login_required
+@retry_on_locked
+def generate_schedule():
+    # The scheduler and bulk writer are only imported by the routes that use them
+    from intervals import day_index
+    from scheduler import solve_schedule
+    from persistence import place_day, insert_sessions
+    from jobs import solver_options
+
+    # Get all subjects for the current user
+    subjects = queries.user_subjects(current_user.id)
+    today = datetime.today().date()
+
+    # Today's free time: availability windows minus busy blocks and the
+    # sessions already on today's timetable, so repeated calls don't overlap
+    taken = [(start, end) for _, start, end in queries.taken_slots(current_user.id, today, today)]
+    index = day_index(queries.calendar_blocks(current_user.id), today, taken)
+    time_limit = min(240, index.free_minutes())
+
+    # Call your fatigue-aware scheduler
+    selected_sessions = solve_schedule(subjects, time_limit, *solver_options()).sessions
+
+    # Sessions go back to back into free slots and are written in one batch
+    rows = place_day(current_user.id, today, selected_sessions, index)
+    insert_sessions(rows)
+
+    db.session.commit()
+    stats.invalidate_progress(current_user.id)
+    if len(rows) < len(selected_sessions):
+        flash(f"{len(selected_sessions) - len(rows)} sessions did not fit into today's free time.", "warning")
+    flash("Today's schedule generated successfully!", "success")
+    return redirect(url_for('pages.dashboard'))
+
+
+@bp.route('/generate_timetable', methods=['GET', 'POST'])
+@login_required
+@retry_on_locked
+def generate_timetable():
+    # Planning and the database rewrite run in the background; see jobs.py
+    from jobs import runner
+
+    if not queries.user_subjects(current_user.id):
+        flash("Add subjects before generating a timetable.", "warning")
+        return redirect(url_for('subjects.subjects'))
+
+    job_id = runner.submit_timetable(current_user.id)
+
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'job_id': job_id, 'status_url': url_for('jobs.job_status', job_id=job_id)}), 202
+
+    flash("Generating your timetable for all days until your exams…", "info")
+    return redirect(url_for('timetable.timetable', job=job_id))